@@ -0,0 +1,132 @@
+import os
+import sys
+from hashlib import blake2b
+from io import BytesIO
+from threading import get_ident
+
+
+try:  # Pillow is optional, Qt is used for thumbnails if it is missing
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# names of image files used as cover art of all files in their directory
+# that don't have embedded (APIC) cover art (compared case-insensitively)
+FOLDER_COVER_NAMES = (
+    'folder.jpg', 'cover.jpg', 'front.jpg', 'folder.png', 'cover.png',
+    'front.png'
+)
+
+
+def can_make_thumbnails():
+    """ returns whether make_thumbnail can work: Pillow is installed or we
+        are running inside the player (Qt is never imported just for this,
+        so e.g. indexer.py stays free of Qt) """
+
+    return Image is not None or 'PySide2.QtGui' in sys.modules
+
+
+def make_thumbnail(data, size):
+    """ returns the image in data downscaled to fit into size x size pixels
+        as jpeg data (None if data isn't a valid image or no thumbnails can
+        be made, see can_make_thumbnails) """
+
+    if Image is not None:
+        try:
+            image = Image.open(BytesIO(data))
+            image.thumbnail((size, size))
+            output = BytesIO()
+            image.convert('RGB').save(output, 'JPEG', quality=85)
+            return output.getvalue()
+        except (OSError, ValueError):  # OSError: not a valid image
+            return None
+
+    if 'PySide2.QtGui' in sys.modules:
+        from PySide2.QtCore import QBuffer, QByteArray, QIODevice, Qt
+        from PySide2.QtGui import QImage
+
+        image = QImage.fromData(data)
+        if image.isNull():  # not a valid image
+            return None
+        if image.width() > size or image.height() > size:
+            image = image.scaled(
+                size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation
+            )
+        output = QByteArray()
+        buffer = QBuffer(output)
+        buffer.open(QIODevice.WriteOnly)
+        if not image.save(buffer, 'JPG', 85):
+            return None
+        return output.data()
+
+    return None
+
+
+def store_cover(data, directory, size):
+    """ stores a thumbnail (see make_thumbnail) of the image in data in
+        directory, unless it has been stored already, and returns its key
+        for get_cover_path (None if no thumbnail could be made) """
+
+    key = blake2b(data, digest_size=16).hexdigest()
+    path = os.path.join(directory, key + '.jpg')
+    if os.path.exists(path):  # same image as for an earlier file
+        return key
+    thumbnail = make_thumbnail(data, size)
+    if thumbnail is None:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file of our own first, the same cover might
+        # be stored by several processes (indexer) or threads (player) at once
+        tmp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+        with open(tmp_path, 'wb') as output_file:
+            output_file.write(thumbnail)
+        os.replace(tmp_path, path)
+    except OSError:
+        return None
+    return key
+
+
+def find_folder_cover(directory, filenames):
+    """ returns the path of the folder cover image (see FOLDER_COVER_NAMES)
+        among filenames (the files of directory), None if there is none """
+
+    for filename in filenames:
+        if filename.lower() in FOLDER_COVER_NAMES:
+            return os.path.join(directory, filename)
+    return None
+
+
+def get_cover_path(key, directory):
+    """ returns the path of the thumbnail with the given key (None if it
+        doesn't exist (anymore)) and marks it as recently used """
+
+    path = os.path.join(directory, key + '.jpg')
+    try:
+        os.utime(path)  # evict_covers removes least recently used first
+    except OSError:
+        return None
+    return path
+
+
+def evict_covers(directory, max_bytes):
+    """ removes the least recently used thumbnails from directory until all
+        thumbnails together take up at most max_bytes """
+
+    try:
+        thumbnails = [
+            (os.stat(os.path.join(directory, f)), os.path.join(directory, f))
+            for f in os.listdir(directory) if f.endswith('.jpg')
+        ]
+    except OSError:  # no thumbnails stored yet
+        return
+    size = sum(stat.st_size for stat, _ in thumbnails)
+    for stat, path in sorted(thumbnails, key=lambda t: t[0].st_mtime):
+        if size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            size -= stat.st_size
+        except OSError:
+            pass
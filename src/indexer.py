@@ -0,0 +1,125 @@
+""" builds or refreshes the tag index used when loading directory sets,
+without starting the player (no Qt or VLC needed), e.g. from cron:
+
+    python indexer.py                 (all sets in ../directories)
+    python indexer.py Default Opera   (only these sets)
+
+run `python indexer.py --help` (from inside src/) for all options """
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from covers import can_make_thumbnails, evict_covers
+from useful_functions import (
+    get_audio_fingerprint, get_directories_from_sets, load_tag_index,
+    read_tags_of_directory, save_tag_index, update_tag_index, TAG_INDEX_PATH,
+    COVERS_DIRECTORY, COVERS_MAX_BYTES
+)
+
+
+def index_directory(directory, tag_index, fingerprint):
+    """ (runs in a worker process)
+        returns (directory, entries, number of files read, error message) for
+        the given directory, tag_index only contains the entries of files in
+        directory """
+
+    try:
+        entries, n_read = read_tags_of_directory(directory, tag_index)
+    except OSError as error:  # directory doesn't exist (anymore), ...
+        return directory, {}, 0, str(error)
+    if fingerprint:
+        for path, entry in entries.items():
+            if 'fingerprint' not in entry:
+                try:
+                    entry['fingerprint'] = get_audio_fingerprint(path)
+                except OSError:
+                    pass
+    return directory, entries, n_read, None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build or refresh the tag index of directory sets.'
+    )
+    parser.add_argument('sets', nargs='*', metavar='SET',
+                        help='names of the directory sets to index (default: '
+                             'all sets in ../directories)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of directories indexed in parallel '
+                             '(default: number of CPUs)')
+    parser.add_argument('-f', '--fingerprint', action='store_true',
+                        help='also compute fingerprints for detecting '
+                             'identical files')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='list files without a TIT2 tag')
+    parser.add_argument('--index', default=TAG_INDEX_PATH,
+                        help=f'path of the tag index (default: '
+                             f'{TAG_INDEX_PATH})')
+    args = parser.parse_args()
+
+    start = perf_counter()
+    sets = [s + '.txt' for s in args.sets] or sorted(
+        s for s in os.listdir('../directories') if s.endswith('.txt')
+    )
+    try:
+        directories = list(dict.fromkeys(get_directories_from_sets(sets)))
+    except OSError as error:
+        sys.exit(f'error: {error}')
+    tag_index = load_tag_index(args.index)
+
+    # only send the entries of a directory to the process indexing it
+    directory_indices = {d: {} for d in directories}
+    for path, entry in tag_index.items():
+        directory = os.path.dirname(path)
+        if directory in directory_indices:
+            directory_indices[directory][path] = entry
+
+    all_entries = {}
+    n_read = 0
+    errors = {}  # {directory: error message}
+    with ProcessPoolExecutor(max(args.jobs, 1)) as executor:
+        futures = [
+            executor.submit(
+                index_directory, d, directory_indices[d], args.fingerprint
+            ) for d in directories
+        ]
+        for future in futures:
+            directory, entries, n_directory_read, error = future.result()
+            if error is None:
+                all_entries.update(entries)
+                n_read += n_directory_read
+            else:
+                errors[directory] = error
+
+    # don't remove entries of directories that couldn't be read
+    update_tag_index(
+        tag_index, [d for d in directories if d not in errors], all_entries
+    )
+    save_tag_index(tag_index, args.index)
+    evict_covers(COVERS_DIRECTORY, COVERS_MAX_BYTES)
+
+    missing_title = [p for p, e in all_entries.items() if e['title'] is None]
+    print(f'indexed {len(sets)} set(s), {len(directories)} directories in '
+          f'{perf_counter() - start:.1f}s')
+    print(f'  files scanned:       {len(all_entries)}')
+    print(f'  tags read:           {n_read}')
+    print(f'  taken from index:    {len(all_entries) - n_read}')
+    print(f'  missing TIT2 tag:    {len(missing_title)}')
+    print(f'  unreadable dirs:     {len(errors)}')
+    if not can_make_thumbnails():
+        print('  (no cover thumbnails made, install Pillow for them, or the '
+              'player makes them when loading the set)')
+    if args.verbose:
+        for path in missing_title:
+            print(f'{path} does not have a TIT2 ID3 tag')
+    for error in errors.values():
+        print(f'error: {error}', file=sys.stderr)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
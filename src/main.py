@@ -1,21 +1,86 @@
+import argparse
 import signal
 import sys
 from PySide2.QtWidgets import QApplication
 from ui import PiecesMainWindow
+from useful_functions import get_directory_sets
+
+
+def parse_startup(argv):
+    """ parses the command line arguments (without the program name) and
+        returns the startup dict for PiecesMainWindow (see PiecesPlayer),
+        None if no sets or directories were given (then the user chooses
+        them in the DirectorySetChooseDialog) """
+
+    parser = argparse.ArgumentParser(
+        description='Play pieces from directory sets. Without sets or '
+                    'directories, they are chosen in a dialog.'
+    )
+    parser.add_argument('sets', nargs='*', metavar='SET',
+                        help='names of the directory sets to play (files in '
+                             '../directories, with or without .txt)')
+    parser.add_argument('-d', '--directory', action='append', default=[],
+                        dest='directories', metavar='DIRECTORY',
+                        help='also play the pieces in DIRECTORY (can be '
+                             'given more than once)')
+    parser.add_argument('--shuffle', action='store_true', default=None,
+                        help='shuffle the playlist (default)')
+    parser.add_argument('--no-shuffle', action='store_false', dest='shuffle',
+                        help='play the pieces in the order they are listed')
+    parser.add_argument('-l', '--loop', action='store_true',
+                        help='loop the playlist')
+    parser.add_argument('-s', '--start', metavar='TITLE',
+                        help='start with the first piece whose title '
+                             'contains TITLE (case-insensitive)')
+    args = parser.parse_args(argv)
+
+    if not args.sets and not args.directories:
+        # the dialog has its own shuffle checkbox and no other options
+        if args.shuffle is not None or args.loop or args.start is not None:
+            parser.error('--shuffle, --no-shuffle, --loop and --start need '
+                         'sets or directories to play')
+        return None
+    sets = [s if s.endswith('.txt') else s + '.txt' for s in args.sets]
+    try:
+        directory_sets = get_directory_sets(sets, args.directories)
+    except OSError as error:  # set doesn't exist
+        parser.error(str(error))
+    if not directory_sets:
+        parser.error('the given sets don\'t contain any directories')
+    return {
+        'directory_sets': directory_sets,
+        'set_str': 'Currently loaded directory set(s):\n"' + '", "'.join(
+            [s[:-4] for s in sets] + args.directories
+        ) + '"',
+        'shuffle': args.shuffle is not False,  # shuffling by default
+        'loop': args.loop,
+        'start': args.start
+    }
 
 
 class MainObject:
     def __init__(self):
+        # parsed first, so --help and invalid arguments exit before anything
+        # is set up
+        startup = parse_startup(sys.argv[1:])
         self._app = QApplication([])
         # needed for when a KeyboardInterrupt is sent before the constructor of
         # PiecesMainWindow has finished
         self._main_window = None
         # for handling KeyboardInterrupts from user
         signal.signal(signal.SIGINT, self._handle_keyboard_interrupt)
-        self._main_window = PiecesMainWindow()
+        # for starting/stopping a profile without using the menu
+        # (`kill -USR1 <pid>`, not available on windows)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._handle_profiling_signal)
+        self._main_window = PiecesMainWindow(startup=startup)
         self._main_window.show()
         sys.exit(self._app.exec_())
 
+    def _handle_profiling_signal(self, sig, frame):
+        if self._main_window:
+            self._main_window.toggle_profiling()
+
     def _handle_keyboard_interrupt(self, sig, frame):
         if self._main_window:
             self._main_window.exit()
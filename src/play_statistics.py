@@ -0,0 +1,141 @@
+import json
+import os
+from datetime import datetime
+from threading import get_ident
+
+
+# events that can be recorded (also the names of the counters in the rollups)
+EVENTS = ('started', 'completed', 'skipped')
+
+
+def make_piece_id(piece):
+    """ returns a str identifying piece ((title, artist, album, directory),
+        see scan_pieces_from_sets) that can be used as a json key """
+
+    return '\t'.join(piece)
+
+
+def _new_counters():
+    return {'started': 0, 'completed': 0, 'skipped': 0, 'listened_ms': 0}
+
+
+class PlayStatistics:
+    """ records play events in an append-only log and keeps aggregated
+        statistics ("rollups") up to date with every event, so reading them
+        doesn't depend on how long the history is
+
+        doc for the rollups (all counters are dicts as returned by
+        _new_counters):
+            {'offset': <bytes of the event log contained in the rollups>,
+             'total': <counters>,
+             'pieces': {<piece id>: <counters>, ...},
+             'sets': {<set name>: <counters>, ...},
+             'days': {'YYYY-MM-DD': <counters>, ...},
+             'months': {'YYYY-MM': {<piece id>: <counters>, ...}, ...}} """
+
+    def __init__(self, directory):
+        """ standard constructor: load the rollups saved in directory and
+            catch up with events that were logged after they were saved
+            (e.g. if the player wasn't closed cleanly) """
+
+        self._directory = directory
+        self._events_path = os.path.join(directory, 'events.jsonl')
+        self._rollups_path = os.path.join(directory, 'rollups.json')
+        self._rollups = {
+            'offset': 0, 'total': _new_counters(), 'pieces': {}, 'sets': {},
+            'days': {}, 'months': {}
+        }
+        try:
+            with open(self._rollups_path, encoding='utf-8') as input_file:
+                self._rollups = json.load(input_file)
+        except (OSError, ValueError):  # ValueError: not valid json
+            pass
+        self.__catch_up()
+
+    def __add(self, event):
+        """ adds event (dict as written to the event log) to the rollups """
+
+        day = event['time'][:10]
+        month = event['time'][:7]
+        months = self._rollups['months'].setdefault(month, {})
+        for counters in (
+            self._rollups['total'],
+            self._rollups['pieces'].setdefault(event['piece'], _new_counters()),
+            self._rollups['sets'].setdefault(event['set'], _new_counters()),
+            self._rollups['days'].setdefault(day, _new_counters()),
+            months.setdefault(event['piece'], _new_counters())
+        ):
+            counters[event['event']] += 1
+            counters['listened_ms'] += event['listened_ms']
+
+    def __catch_up(self):
+        """ adds the events logged after self._rollups['offset'] """
+
+        try:
+            with open(self._events_path, 'rb') as input_file:
+                input_file.seek(self._rollups['offset'])
+                for line in input_file:
+                    if not line.endswith(b'\n'):  # incompletely written
+                        break
+                    try:
+                        self.__add(json.loads(line))
+                    except (ValueError, KeyError):  # broken line, skip it
+                        pass
+                    self._rollups['offset'] += len(line)
+        except OSError:  # no events logged yet
+            pass
+
+    def get_rollups(self):
+        """ getter function for the statistics dialog (must not be
+            modified) """
+
+        return self._rollups
+
+    def record(self, event, piece, set_name, movement, position_ms,
+               listened_ms):
+        """ logs an event and adds it to the rollups:
+                - event: one of EVENTS
+                - piece: (title, artist, album, directory)
+                - set_name: name of the directory set piece is from
+                - movement: index of the movement that was playing
+                - position_ms: position in that movement
+                - listened_ms: time the piece was actually listened to (only
+                  counted for the event ending a piece) """
+
+        if event not in EVENTS:
+            raise ValueError(f'Unknown play event: {event}')
+        event = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'event': event,
+            'piece': make_piece_id(piece),
+            'set': set_name,
+            'movement': movement,
+            'position_ms': position_ms,
+            'listened_ms': listened_ms
+        }
+        line = (json.dumps(event) + '\n').encode('utf-8')
+        # another player might have appended to the event log in the
+        # meantime, add its events first
+        self.__catch_up()
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(self._events_path, 'ab') as output_file:
+                output_file.write(line)
+                self._rollups['offset'] = output_file.tell()
+        except OSError:  # statistics must never stop the music
+            pass
+        self.__add(event)
+
+    def save(self):
+        """ saves the rollups, so they don't have to be computed from the
+            event log again next time """
+
+        # temporary file of our own, another player might save at once
+        tmp_path = f'{self._rollups_path}.{os.getpid()}.{get_ident()}.tmp'
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as output_file:
+                json.dump(self._rollups, output_file)
+            os.replace(tmp_path, self._rollups_path)
+        except OSError:
+            pass
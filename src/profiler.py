@@ -0,0 +1,94 @@
+import os
+import sys
+from cProfile import Profile
+from datetime import datetime
+from threading import Event, Thread, enumerate as enumerate_threads, get_ident
+
+
+class SamplingProfiler:
+    """ in-process profiler that can be started and stopped while the player
+        is running: the thread calling start (i.e. the Qt event loop with
+        all timers and actions) is profiled by cProfile, additionally the
+        stacks of all threads (worker threads included) are sampled
+        periodically by a separate thread
+
+        stop writes a .pstats file (cProfile, e.g. for snakeviz or pstats)
+        and a .collapsed file (sampled stacks, one "stack count" per line,
+        e.g. for flamegraph.pl or speedscope) """
+
+    def __init__(self, directory, interval=0.005):
+        """ standard constructor: set up class variables
+                - directory: directory the profile files are written to
+                - interval: seconds between two samples of all stacks """
+
+        self._directory = directory
+        self._interval = interval
+        self._profile = None
+        self._sampler = None
+        self._stop_sampling = Event()
+        # {<"thread;outermost frame;...;innermost frame">: <count>, ...}
+        self._stacks = {}
+
+    def __sample(self):
+        """ (runs in self._sampler)
+            adds the current stacks of all other threads to self._stacks until
+            self._stop_sampling is set """
+
+        own_ident = get_ident()
+        while not self._stop_sampling.wait(self._interval):
+            names = {t.ident: t.name for t in enumerate_threads()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(
+                        f'{code.co_name} ({os.path.basename(code.co_filename)}'
+                        f':{code.co_firstlineno})'
+                    )
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread {ident}'))
+                key = ';'.join(reversed(stack))
+                self._stacks[key] = self._stacks.get(key, 0) + 1
+
+    def is_running(self):
+        return self._profile is not None
+
+    def start(self):
+        """ starts profiling (does nothing if already running) """
+
+        if self.is_running():
+            return
+        self._stacks = {}
+        self._stop_sampling.clear()
+        self._sampler = Thread(
+            target=self.__sample, name='profiler', daemon=True
+        )
+        self._sampler.start()
+        self._profile = Profile()
+        self._profile.enable()
+
+    def stop(self):
+        """ stops profiling and writes the profile files, returns the path of
+            the files without extension (None if profiling wasn't running) """
+
+        if not self.is_running():
+            return None
+        self._profile.disable()
+        self._stop_sampling.set()
+        self._sampler.join()
+
+        os.makedirs(self._directory, exist_ok=True)
+        path = os.path.join(
+            self._directory,
+            datetime.now().strftime('profile-%Y%m%d-%H%M%S')
+        )
+        self._profile.dump_stats(path + '.pstats')
+        with open(path + '.collapsed', 'w', encoding='utf-8') as output_file:
+            for stack, count in sorted(self._stacks.items()):
+                output_file.write(f'{stack} {count}\n')
+
+        self._profile = None
+        self._sampler = None
+        return path
@@ -0,0 +1,435 @@
+""" headless long-run soak test for PiecesPlayer
+
+drives thousands of movement/piece transitions, seeks and reloads through a
+PiecesMainWindow (Qt offscreen platform, stub VLC backend, no global hotkeys)
+and samples memory, object counts and open file descriptors along the way;
+exits with status 1 if anything grew more than allowed after the warm-up
+
+run `python soak.py --help` (from inside src/) for the available options """
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from random import Random, seed, shuffle
+from tempfile import TemporaryDirectory
+from types import ModuleType
+
+
+# must be set before the QApplication is created
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+
+# -- stub VLC backend --
+class StubMedia:
+    """ stands in for vlc.Media, keeps track of how many media objects have
+        been created but not released yet """
+
+    live = 0
+
+    def __init__(self, path):
+        self._path = path
+        self._released = False
+        StubMedia.live += 1
+
+    def get_duration(self):
+        # imported here because useful_functions must not be imported before
+        # the stubs are installed (it doesn't need them, but ui does)
+        from useful_functions import get_movement_durations
+        return get_movement_durations([self._path])[0]
+
+    def parse(self):
+        pass
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            StubMedia.live -= 1
+
+
+class StubMediaPlayer:
+    """ stands in for vlc.MediaPlayer, "plays" by advancing its time whenever
+        advance is called and fires MediaPlayerEndReached at the end of a
+        medium like the real one does """
+
+    def __init__(self):
+        self._medium = None
+        self._time = 0
+        self._playing = False
+        self._callbacks = {}
+
+    def advance(self, ms):
+        if self._playing and self._medium:
+            self._time += ms
+            if self._time >= self._medium.get_duration():
+                self._time = self._medium.get_duration()
+                self._playing = False
+                callback = self._callbacks.get(
+                    StubEventType.MediaPlayerEndReached
+                )
+                if callback:
+                    callback(None)
+
+    def audio_output_device_enum(self):
+        return None
+
+    def audio_output_device_set(self, module, device):
+        pass
+
+    def audio_set_volume(self, volume):
+        pass
+
+    def event_attach(self, event_type, callback):
+        self._callbacks[event_type] = callback
+
+    def event_manager(self):
+        return self
+
+    def get_position(self):
+        duration = self._medium.get_duration() if self._medium else 0
+        return self._time / duration if duration > 0 else 0.0
+
+    def get_time(self):
+        return self._time
+
+    def is_playing(self):
+        return self._playing
+
+    def pause(self):
+        self._playing = False
+
+    def play(self):
+        self._playing = self._medium is not None
+
+    def release(self):
+        pass
+
+    def set_media(self, medium):
+        self._medium = medium
+        self._time = 0
+
+    def set_position(self, position):
+        if self._medium:
+            self._time = int(position * self._medium.get_duration())
+
+    def set_time(self, ms):
+        self._time = ms
+
+    def stop(self):
+        self._playing = False
+        self._time = 0
+
+
+class StubInstance:
+    """ stands in for vlc.Instance """
+
+    def __init__(self, *args):
+        self.media_players = []
+
+    def media_new(self, path):
+        return StubMedia(path)
+
+    def media_player_new(self):
+        self.media_players.append(StubMediaPlayer())
+        return self.media_players[-1]
+
+    def release(self):
+        pass
+
+
+class StubEventType:
+    """ stands in for vlc.EventType """
+
+    MediaPlayerEndReached = 'MediaPlayerEndReached'
+
+
+class StubKeyboardListener:
+    """ stands in for pynput.keyboard.Listener (no global hotkeys needed and
+        there is no display to listen on anyway) """
+
+    def __init__(self, on_press=None):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def install_stubs():
+    """ makes `import vlc` and `import pynput` resolve to the stubs above,
+        must be called before ui is imported """
+
+    vlc = ModuleType('vlc')
+    vlc.Instance = StubInstance
+    vlc.EventType = StubEventType
+    vlc.libvlc_audio_output_device_list_release = lambda device_list: None
+    pynput = ModuleType('pynput')
+    pynput.keyboard = ModuleType('pynput.keyboard')
+    pynput.keyboard.Listener = StubKeyboardListener
+    sys.modules['vlc'] = vlc
+    sys.modules['pynput'] = pynput
+    sys.modules['pynput.keyboard'] = pynput.keyboard
+
+
+# -- synthetic library --
+# one frame of silence (MPEG-1 layer III, 128 kbit/s, 44.1 kHz)
+SILENT_MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+
+
+def create_library(root, n_pieces, n_movements):
+    """ creates n_pieces pieces of n_movements silent, tagged mp3 files each
+        (spread over a few directories) below root and returns the list of
+        directories """
+
+    from mutagen.easyid3 import EasyID3
+
+    directories = []
+    for piece in range(n_pieces):
+        directory = os.path.join(root, f'album{piece // 5:03d}')
+        if directory not in directories:
+            os.makedirs(directory)
+            directories.append(directory)
+        for movement in range(n_movements):
+            path = os.path.join(
+                directory, f'{piece % 5:02d}{movement:02d} movement.mp3'
+            )
+            with open(path, 'wb') as output_file:
+                # a few seconds of silence, slightly different per movement
+                output_file.write(SILENT_MP3_FRAME * (100 + 10 * movement))
+            tags = EasyID3()
+            tags['title'] = f'Piece {piece} - Movement {movement + 1}'
+            tags['artist'] = 'Soak Test'
+            tags['album'] = os.path.basename(directory)
+            tags.save(path)
+    return directories
+
+
+# -- measuring --
+def count_open_fds():
+    """ returns the number of open file descriptors of this process
+        (None if that can't be determined on this platform) """
+
+    for fd_dir in ('/proc/self/fd', '/dev/fd'):
+        if os.path.isdir(fd_dir):
+            return len(os.listdir(fd_dir))
+    return None
+
+
+def take_sample(iteration, window, app):
+    """ collects garbage, deletes Qt objects scheduled for deletion and
+        returns a dict of the current resource usage """
+
+    from PySide2.QtCore import QEvent, QObject
+
+    app.processEvents()
+    app.sendPostedEvents(None, QEvent.DeferredDelete)
+    gc.collect()
+    return {
+        'iteration': iteration,
+        'traced_kib': tracemalloc.get_traced_memory()[0] // 1024,
+        'objects': len(gc.get_objects()),
+        'qt_objects': len(window.findChildren(QObject)),
+        'vlc_media': StubMedia.live,
+        'fds': count_open_fds()
+    }
+
+
+def print_samples(samples):
+    keys = list(samples[0].keys())
+    print(' '.join(f'{k:>12}' for k in keys))
+    for sample in samples:
+        print(' '.join(f'{str(sample[k]):>12}' for k in keys))
+
+
+def check_growth(baseline, last, limits):
+    """ returns a list of human-readable descriptions of every measurement
+        that grew more than allowed by limits ({key: max. growth}) """
+
+    failures = []
+    for key, limit in limits.items():
+        if baseline[key] is None or last[key] is None:
+            continue
+        growth = last[key] - baseline[key]
+        if growth > limit:
+            failures.append(
+                f'{key} grew by {growth} (from {baseline[key]} to '
+                f'{last[key]}, allowed: {limit})'
+            )
+    return failures
+
+
+# -- driving the player --
+def run(args, directories, root):
+    """ creates the main window, drives it for args.iterations iterations and
+        returns the list of samples taken and the tracemalloc snapshots at the
+        end of the warm-up and at the end """
+
+    from PySide2.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+
+    import ui
+    import useful_functions
+    from useful_functions import scan_pieces_from_directories
+
+    # don't touch the real statistics, staging cache and cover thumbnails
+    ui.STATISTICS_DIRECTORY = os.path.join(root, 'statistics')
+    ui.STAGING_DIRECTORY = os.path.join(root, 'staging')
+    useful_functions.COVERS_DIRECTORY = os.path.join(root, 'covers')
+
+    def exec_soak_set_choose_dialog(dialog):
+        """ replaces DirectorySetChooseDialog.exec_, doesn't wait for user
+            input but loads the soak test directories directly """
+
+        pieces, report = scan_pieces_from_directories(directories)
+        playlist = list(pieces.keys())
+        shuffle(playlist)
+        dialog._set_pieces_and_playlist(
+            pieces, playlist, 'Soak test library', True, report
+        )
+        dialog.close()
+        return 0
+
+    # (replacing the class itself would break its super() calls)
+    ui.DirectorySetChooseDialog.exec_ = exec_soak_set_choose_dialog
+
+    window = ui.PiecesMainWindow()
+    player = window.centralWidget()
+    media_player = player._vlc_mediaplayer
+    player._btn_loop.setChecked(True)  # never reach the end of the playlist
+    window.set_stage_upcoming(args.stage_upcoming)
+    reload_action = [
+        a for a in window._menu_options.actions()
+        if a.text() == 'Load new directory set(s)'
+    ][0]
+
+    random = Random(args.seed)
+    samples = []
+    snapshots = []
+    for iteration in range(args.iterations + 1):
+        if iteration == args.warmup:
+            samples.append(take_sample(iteration, window, app))
+            snapshots.append(tracemalloc.take_snapshot())
+        elif iteration % args.sample_every == 0 and iteration > args.warmup:
+            samples.append(take_sample(iteration, window, app))
+        if iteration == args.iterations:
+            snapshots.append(tracemalloc.take_snapshot())
+            break
+
+        action = random.random()
+        if iteration > 0 and iteration % args.reload_every == 0:
+            reload_action.trigger()
+        elif action < 0.35:  # movement ends by itself
+            if not media_player.is_playing():
+                player._btn_play_pause.click()
+            media_player.advance(10 ** 6)
+        elif action < 0.55:
+            player._btn_next.click()
+        elif action < 0.65:
+            player._btn_previous.click()
+        elif action < 0.75:
+            player._btn_play_pause.click()
+        elif action < 0.9:  # seek somewhere in the whole piece
+            player._slider_piece_time.setValue(random.randint(
+                0, player._slider_piece_time.maximum()
+            ))
+            player._slider_piece_time.sliderReleased.emit()
+        else:  # seek inside the current movement
+            player._slider_time.setValue(random.randint(0, 100))
+            player._slider_time.sliderReleased.emit()
+        media_player.advance(random.randint(0, 2000))
+        player._timer.timeout.emit()  # run the periodic update
+        app.processEvents()
+
+    window.exit()
+    return samples, snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Headless long-run soak test for the pieces player.'
+    )
+    parser.add_argument('--iterations', type=int, default=5000,
+                        help='number of actions to perform (default: 5000)')
+    parser.add_argument('--warmup', type=int, default=500,
+                        help='iterations before the baseline sample is taken '
+                             '(default: 500)')
+    parser.add_argument('--sample-every', type=int, default=500,
+                        help='iterations between samples (default: 500)')
+    parser.add_argument('--reload-every', type=int, default=1000,
+                        help='iterations between reloads of the directory '
+                             'sets (default: 1000)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for choosing the actions and shuffling the '
+                             'playlists (default: 0)')
+    parser.add_argument('--sets', nargs='+', metavar='SET',
+                        help='directory sets to use instead of a generated '
+                             'library (e.g. Default)')
+    parser.add_argument('--pieces', type=int, default=20,
+                        help='pieces in the generated library (default: 20)')
+    parser.add_argument('--movements', type=int, default=4,
+                        help='movements per piece in the generated library '
+                             '(default: 4)')
+    parser.add_argument('--stage-upcoming', action='store_true',
+                        help='copy upcoming movements to the staging cache '
+                             'like on a slow network mount')
+    parser.add_argument('--max-memory-growth', type=int, default=2048,
+                        help='allowed growth of traced memory in KiB '
+                             '(default: 2048)')
+    parser.add_argument('--max-object-growth', type=int, default=2000,
+                        help='allowed growth of the number of python objects '
+                             '(default: 2000)')
+    parser.add_argument('--max-qt-object-growth', type=int, default=10,
+                        help='allowed growth of the number of Qt objects '
+                             '(default: 10)')
+    parser.add_argument('--max-fd-growth', type=int, default=5,
+                        help='allowed growth of open file descriptors '
+                             '(default: 5)')
+    args = parser.parse_args()
+    if args.warmup >= args.iterations:
+        parser.error('--warmup must be smaller than --iterations')
+
+    # playlists are shuffled with the global random (also by PiecesPlayer),
+    # so it must be seeded as well to be able to reproduce a run
+    seed(args.seed)
+    install_stubs()
+    tracemalloc.start(25)
+
+    with TemporaryDirectory() as root:
+        if args.sets:
+            from useful_functions import get_directories_from_sets
+            directories = get_directories_from_sets(
+                [s + '.txt' for s in args.sets]
+            )
+        else:
+            directories = create_library(root, args.pieces, args.movements)
+        samples, snapshots = run(args, directories, root)
+
+    print_samples(samples)
+    print('\nlargest allocation growth since the end of the warm-up:')
+    for stat in snapshots[1].compare_to(snapshots[0], 'lineno')[:10]:
+        print(stat)
+
+    failures = check_growth(samples[0], samples[-1], {
+        'traced_kib': args.max_memory_growth,
+        'objects': args.max_object_growth,
+        'qt_objects': args.max_qt_object_growth,
+        'vlc_media': 0,
+        'fds': args.max_fd_growth
+    })
+    if samples[-1]['vlc_media'] > 1:
+        failures.append(
+            f'{samples[-1]["vlc_media"]} vlc media objects have not been '
+            'released'
+        )
+    if failures:
+        print('\nFAILED:\n' + '\n'.join(failures))
+        sys.exit(1)
+    print('\nOK')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+import os
+from collections import OrderedDict
+from hashlib import blake2b
+from shutil import copyfile, rmtree
+from tempfile import mkdtemp
+from threading import Condition, Thread
+
+
+class StagingCache:
+    """ copies files (e.g. from slow network mounts) to a local cache
+        directory in a background thread, so they can be played from there
+
+        the cache is bounded by size, the least recently used files are
+        removed first
+
+        it can be shared (e.g. by all zones): every owner has its own queue
+        of files to copy, the queues are served in turns """
+
+    def __init__(self, directory, max_bytes):
+        """ standard constructor: set up class variables and start the worker
+            thread:
+                - directory: local directory our own cache directory is
+                  created in (only accessible by the current user, so other
+                  players running at the same time are never affected)
+                - max_bytes: maximum size of all files in the cache """
+
+        os.makedirs(directory, exist_ok=True)
+        self._directory = mkdtemp(prefix='pieces-gui-staging-', dir=directory)
+        self._max_bytes = max_bytes
+        # {<original path>: (<local path>, <size>), ...}
+        # (least recently used first)
+        self._entries = OrderedDict()
+        self._size = 0  # size of all files in self._entries
+        # {<owner>: [<original paths that should be copied next>], ...}
+        # (owner whose turn it is first, see self.__work)
+        self._pending = OrderedDict()
+        self._closed = False
+        # protects all of the above, self.__work waits on it for new paths
+        self._condition = Condition()
+
+        self._thread = Thread(target=self.__work, name='staging', daemon=True)
+        self._thread.start()
+
+    def __copy(self, path):
+        """ copies path to the cache directory and returns (local path,
+            size), (None, 0) if that didn't work """
+
+        local_path = os.path.join(
+            self._directory,
+            blake2b(path.encode(), digest_size=16).hexdigest() +
+            os.path.splitext(path)[1]
+        )
+        try:
+            size = os.path.getsize(path)
+            if size > self._max_bytes:  # would never fit
+                return None, 0
+            # copy to temporary file first, so a file that hasn't been copied
+            # completely is never played
+            copyfile(path, local_path + '.part')
+            os.replace(local_path + '.part', local_path)
+        except OSError:  # share not reachable, disk full, ...
+            return None, 0
+        return local_path, size
+
+    def __evict(self, needed_bytes):
+        """ removes least recently used files until needed_bytes fit into the
+            cache (must be called with self._condition acquired) """
+
+        for path in list(self._entries.keys()):
+            if self._size + needed_bytes <= self._max_bytes:
+                break
+            local_path, size = self._entries[path]
+            try:
+                os.remove(local_path)
+            except FileNotFoundError:
+                pass
+            except OSError:  # still in use (windows), try the next one
+                continue
+            del self._entries[path]
+            self._size -= size
+
+    def __work(self):
+        """ (runs in self._thread)
+            copies pending files one after the other until close is called """
+
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                # take the next path of the first owner and let the other
+                # owners have their turns before it's the first one's again
+                owner, paths = self._pending.popitem(last=False)
+                path = paths.pop(0)
+                if paths:
+                    self._pending[owner] = paths
+                if path in self._entries:  # staged in the meantime
+                    continue
+
+            # copy without holding the lock, get_path must not block
+            local_path, size = self.__copy(path)
+            if local_path is None:
+                continue
+
+            with self._condition:
+                if self._closed:
+                    return
+                self.__evict(size)
+                if self._size + size <= self._max_bytes:
+                    self._entries[path] = (local_path, size)
+                    self._size += size
+                else:  # everything else is in use, so just don't keep it
+                    try:
+                        os.remove(local_path)
+                    except OSError:
+                        pass
+
+    def close(self):
+        """ stops the worker thread and removes the cache directory with all
+            cached files """
+
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify()
+        # a file might still be copied, but the thread is a daemon anyway
+        self._thread.join(1)
+        with self._condition:
+            for local_path, _ in self._entries.values():
+                try:
+                    os.remove(local_path)
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._size = 0
+            # also removes a file that was still being copied (if possible)
+            rmtree(self._directory, ignore_errors=True)
+
+    def get_path(self, path):
+        """ returns the path of the local copy of path if it has been copied
+            already (marking it as recently used), else path itself """
+
+        with self._condition:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+                return self._entries[path][0]
+        return path
+
+    def stage(self, owner, paths):
+        """ lets the worker thread copy the given paths (in that order) to the
+            cache, replacing the paths that still had to be copied from the
+            last call with the same owner (any hashable identifying the
+            caller, e.g. a zone's player, calls of other owners don't affect
+            them), an empty list of paths just cancels the owner's copies """
+
+        with self._condition:
+            if self._closed:
+                return
+            paths = [p for p in paths if p not in self._entries]
+            if paths:
+                self._pending[owner] = paths
+            else:
+                self._pending.pop(owner, None)
+            self._condition.notify()
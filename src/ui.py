@@ -1,6 +1,11 @@
+from collections import OrderedDict
+from collections.abc import Mapping
 from datetime import datetime
+from functools import partial
 from os import listdir, name as os_name
 from random import shuffle
+from threading import Thread
+from time import monotonic
 
 
 if os_name == 'nt':
@@ -10,20 +15,37 @@ if os_name == 'nt':
 
 from pynput import keyboard
 from PySide2.QtCore import Qt, QTimer
-from PySide2.QtGui import QIcon, QKeySequence
+from PySide2.QtGui import QIcon, QKeySequence, QPixmap
 from PySide2.QtWidgets import (
     QMainWindow, QWidget, QDialog, QMessageBox, QGridLayout, QHBoxLayout,
     QVBoxLayout, QAbstractItemView, QListWidget, QTextEdit, QLineEdit, QSlider,
-    QLabel, QPushButton, QCheckBox, QShortcut
+    QLabel, QPushButton, QCheckBox, QShortcut, QStyle, QStyleOptionSlider,
+    QInputDialog
+)
+from vlc import (
+    Instance as VLCInstance, EventType as VLCEventType,
+    libvlc_audio_output_device_list_release
 )
-from vlc import Instance as VLCInstance, EventType as VLCEventType
 
+from play_statistics import PlayStatistics
+from profiler import SamplingProfiler
+from staging import StagingCache
 from useful_functions import (
-    create_info_str, get_pieces_from_sets, make_history_string_from_dict,
-    get_icon_path, get_time_str_from_ms
+    create_info_str, scan_pieces_from_sets, make_history_string_from_dict,
+    make_report_string_from_dict, get_icon_path, get_time_str_from_ms,
+    get_movement_durations, make_piece_timeline, locate_in_piece_timeline,
+    freeze_pieces, make_statistics_string_from_dict, get_piece_cover_path,
+    scan_pieces_from_directories, scan_pieces_from_directory_sets,
+    load_tag_index, find_piece, find_piece_directory,
+    STAGING_DIRECTORY, STAGING_MAX_BYTES, PROFILES_DIRECTORY,
+    STATISTICS_DIRECTORY, COVER_SIZE
 )
 
 
+# number of cover thumbnails every PiecesPlayer keeps loaded (as QPixmaps)
+COVER_PIXMAPS_CACHED = 16
+
+
 class DirectorySetChooseDialog(QDialog):
     """ simple dialog to let user choose from the available directory sets """
 
@@ -44,6 +66,9 @@ class DirectorySetChooseDialog(QDialog):
         self._listwidget_sets = QListWidget()
         self._checkbox_shuffle = QCheckBox('Shuffle playlist')
         self._checkbox_shuffle.setChecked(True)  # shuffling enabled by default
+        self._checkbox_fingerprint = QCheckBox(
+            'Detect identical files (slower)'
+        )
         self._listwidget_sets.itemDoubleClicked.connect(self.__action_choose)
         self._btn_choose = QPushButton('Choose')
         self._btn_choose.clicked.connect(self.__action_choose)
@@ -64,11 +89,15 @@ class DirectorySetChooseDialog(QDialog):
         self._layout.addWidget(self._lbl_prompt, 0, 0, 1, -1)
         self._layout.addWidget(self._listwidget_sets, 1, 0, 4, -1)
         self._layout.addWidget(self._checkbox_shuffle, 5, 0, 1, -1)
-        self._layout.addWidget(self._btn_choose, 6, 0, 1, -1)
+        self._layout.addWidget(self._checkbox_fingerprint, 6, 0, 1, -1)
+        self._layout.addWidget(self._btn_choose, 7, 0, 1, -1)
 
         # -- various setup --
         self._set_pieces_and_playlist = set_pieces_and_playlist_function
         self.setModal(True)
+        # a new dialog is created every time, so don't keep old ones around
+        # as children of parent
+        self.setAttribute(Qt.WA_DeleteOnClose)
         self.setWindowTitle('Please choose a directory set')
         self.setMinimumWidth(600)
         self.setMinimumHeight(400)
@@ -81,44 +110,52 @@ class DirectorySetChooseDialog(QDialog):
         selected_sets = self._listwidget_sets.selectedItems()
         selected_str = 'Currently loaded directory set(s):\n"' + \
             '", "'.join([s.text() for s in selected_sets]) + '"'
-        pieces = get_pieces_from_sets([
-            s.text() + '.txt' for s in selected_sets
-        ])
+        pieces, report = scan_pieces_from_sets(
+            [s.text() + '.txt' for s in selected_sets],
+            self._checkbox_fingerprint.isChecked()
+        )
         playlist = list(pieces.keys())  # must be a list to be shuffled
         shuffled = self._checkbox_shuffle.isChecked()
         if shuffled:
             shuffle(playlist)
-        self._set_pieces_and_playlist(pieces, playlist, selected_str, shuffled)
+        self._set_pieces_and_playlist(
+            pieces, playlist, selected_str, shuffled, report
+        )
         self.close()
 
 
-class HistoryDialog(QDialog):
-    """ a simple dialog to let the user view the playing history """
+class TextDialog(QDialog):
+    """ a simple dialog to let the user view a (long) text, e.g. the playing
+        history """
 
-    def __init__(self, parent, history_str):
+    def __init__(self, parent, text, title):
         """ standard constructor: set up class variables, ui elements and layout
             parameters:
                 - parent: parent widget of this dialog
-                - history_str: str that will be displayed """
+                - text: str that will be displayed
+                - title: window title of this dialog """
 
-        super(HistoryDialog, self).__init__(parent)
+        super(TextDialog, self).__init__(parent)
 
         # -- create and setup ui elements --
-        self._textview_history = QTextEdit('', parent=parent)
-        self._textview_history.setReadOnly(True)
+        self._textview = QTextEdit('', parent=parent)
+        self._textview.setReadOnly(True)
         # plain text needed for showing newlines
-        self._textview_history.setPlainText(history_str)
+        self._textview.setPlainText(text)
         self._btn_ok = QPushButton('OK')
         self._btn_ok.clicked.connect(self.__action_ok)
 
         # -- create layout --
         self._layout = QVBoxLayout(self)
-        self._layout.addWidget(self._textview_history)
+        self._layout.addWidget(self._textview)
         self._layout.addWidget(self._btn_ok)
 
         # -- various setup --
         self.setModal(True)
-        self.setWindowTitle('Playing History')
+        # a new dialog is created every time, so don't keep old ones around
+        # as children of parent
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle(title)
         self.setMinimumWidth(800)
         self.setMinimumHeight(300)
 
@@ -129,20 +166,69 @@ class HistoryDialog(QDialog):
         self.close()
 
 
+class JumpSlider(QSlider):
+    """ QSlider that jumps to the position the user clicked at (instead of
+        moving by one page step), the handle can then be dragged as usual """
+
+    def mousePressEvent(self, event):
+        """ -- override (inherited from QSlider) --
+            (called when user presses a mouse button on this slider)
+            moves the handle to the clicked position before handling the
+            press, so the press grabs the handle and sliderReleased is emitted
+            as if the user had dragged it there """
+
+        if event.button() == Qt.LeftButton:
+            option = QStyleOptionSlider()
+            self.initStyleOption(option)
+            handle = self.style().subControlRect(
+                QStyle.CC_Slider, option, QStyle.SC_SliderHandle, self
+            )
+            if not handle.contains(event.pos()):
+                if self.orientation() == Qt.Horizontal:
+                    position = event.x() - handle.width() // 2
+                    span = self.width() - handle.width()
+                else:
+                    position = event.y() - handle.height() // 2
+                    span = self.height() - handle.height()
+                self.setValue(QStyle.sliderValueFromPosition(
+                    self.minimum(), self.maximum(), position, span,
+                    option.upsideDown
+                ))
+        super(JumpSlider, self).mousePressEvent(event)
+
+
 class PiecesPlayer(QWidget):
     """ main widget of application (used as widget inside PiecesMainWindow) """
 
-    def __init__(self, parent):
+    def __init__(self, parent, vlc_instance, staging_cache, play_statistics,
+                 library=None, global_hotkeys=True, startup=None):
         """ standard constructor: set up class variables, ui elements
-            and layout """
+            and layout:
+                - parent: the PiecesMainWindow this widget is used in
+                - vlc_instance: the VLC instance to create our media player
+                  with (may be shared with other PiecesPlayers)
+                - staging_cache: StagingCache that upcoming movements are
+                  copied to, if wanted (may be shared as well)
+                - play_statistics: PlayStatistics to record started, completed
+                  and skipped pieces in (may be shared as well)
+                - library: dict as returned by get_library of another
+                  PiecesPlayer, whose (immutable) pieces will be shared
+                  instead of letting the user choose directory sets
+                - global_hotkeys: whether to listen to media keys (should
+                  only be done by one PiecesPlayer)
+                - startup: dict of command line options (see main.py) to
+                  start playing right away instead of letting the user
+                  choose directory sets (ignored if library is given):
+                  {'directory_sets': <see get_directory_sets>,
+                   'set_str': <str describing the sets and directories>,
+                   'shuffle': <bool>, 'loop': <bool>,
+                   'start': <(part of) title of the piece to start with, or
+                             None>} """
 
         # TODO: split current piece info into separate lineedits for title, album name and length
-        # TODO: make time changeable by clicking next to the slider (not only
-        #       by dragging the slider)
         # TODO: add "about" action to open info dialog in new "help" menu
         # TODO: add option to loop current piece (?)
         # TODO: more documentation
-        # TODO: add some "whole piece time remaining" indicator? (complicated)
         # TODO: implement a playlist of pieces that can be edited and enable
         #       going back to the previous piece (also un- and re-shuffling?)
         # TODO: implement debug dialog as menu action (if needed)
@@ -155,7 +241,12 @@ class PiecesPlayer(QWidget):
         # -- declare and setup variables for storing information --
         # various data
         self._set_str = ''  # string of currently loaded directory sets
-        self._pieces = {}  # {<piece1>: [<files piece1 consists of>], ...}
+        # {<piece1>: (<files piece1 consists of>), ...}, pieces are
+        # (title, artist, album, directory) tuples (see scan_pieces_from_sets)
+        # (read-only, see freeze_pieces, so it can be shared by all zones)
+        self._pieces = {}
+        # duplicates and collisions found while scanning the directory sets
+        self._report = {}
         self._playlist = []  # list of keys of self._pieces (determines order)
         self._shuffled = True  # needed for (maybe) reshuffling when looping
         # doc for self._history:
@@ -163,17 +254,48 @@ class PiecesPlayer(QWidget):
         # value: info_str of piece that started playing at that time
         self._history = {}
         self._status = 'Paused'
-        self._current_piece = {'title': '', 'files': [], 'play_next': 0}
+        # doc for self._current_piece['timeline']:
+        # start of every movement and end of the piece in ms
+        # (see make_piece_timeline)
+        self._current_piece = {
+            'title': '', 'files': [], 'play_next': 0, 'timeline': [0]
+        }
         self._default_volume = 60  # in percent from 0 - 100
         self._volume_before_muted = self._default_volume
         # set to true by self.__event_movement_ended and used by self.__update
         self._skip_to_next = False
+        # doc for self._background_scan (see self.__load_startup):
+        # {'start_piece': <piece that was played first>,
+        #  'result': <(pieces, report) once scanned>,
+        #  'error': <error message if scanning failed>}
+        # (None if no scan is running, result is used by self.__update)
+        self._background_scan = None
+        # offset (in ms) to seek to as soon as the newly loaded movement is
+        # playing (set by self.__event_piece_time_changed_by_user)
+        self._seek_to = None
+        # statistics-related variables
+        self._play_statistics = play_statistics  # saved by PiecesMainWindow
+        # set to true once the current piece has actually started playing
+        # (only then leaving it is recorded, see self.__record_piece_end)
+        self._piece_started = False
+        # set to true by self.__update if the last movement of the current
+        # piece has ended (else leaving the piece means it was skipped)
+        self._piece_completed = False
+        # seconds the current piece has been playing for (and time of the
+        # last update of that value, both updated by self.__update)
+        self._listened = 0.0
+        self._last_update = monotonic()
         # vlc-related variables
-        self._vlc_instance = VLCInstance()
+        self._vlc_instance = vlc_instance  # released by PiecesMainWindow
         self._vlc_mediaplayer = self._vlc_instance.media_player_new()
         self._vlc_mediaplayer.audio_set_volume(self._default_volume)
         self._vlc_medium = None
+        self._output_device = None  # None means vlc's default device
+        self._staging_cache = staging_cache  # closed by PiecesMainWindow
         self._vlc_events = self._vlc_mediaplayer.event_manager()
+        # {<path of cover thumbnail>: <QPixmap>, ...}, least recently shown
+        # first (see self.__update_cover)
+        self._cover_pixmaps = OrderedDict()
 
         # -- create and setup ui elements --
         # buttons
@@ -192,18 +314,29 @@ class PiecesPlayer(QWidget):
         self._lbl_movements = QLabel('Movements:')
         self._lbl_time_played = QLabel('00:00')
         self._lbl_time_left = QLabel('-00:00')
+        self._lbl_piece_time_played = QLabel('00:00')
+        self._lbl_piece_time_left = QLabel('-00:00')
         self._lbl_volume = QLabel('100%')
         # needed so that everything has the same position
         # independent of the number of digits of volume
         self._lbl_volume.setMinimumWidth(55)
+        self._lbl_cover = QLabel()  # cover art of current piece
+        self._lbl_cover.setFixedWidth(COVER_SIZE)
+        self._lbl_cover.setAlignment(Qt.AlignCenter)
+        self._lbl_cover.hide()  # shown if current piece has cover art
         # sliders
-        self._slider_time = QSlider(Qt.Horizontal)
+        self._slider_time = JumpSlider(Qt.Horizontal)
+        self._slider_piece_time = JumpSlider(Qt.Horizontal)
         self._slider_volume = QSlider(Qt.Horizontal)
         self._slider_time.sliderReleased.connect(
             self.__event_time_changed_by_user
         )
+        self._slider_piece_time.sliderReleased.connect(
+            self.__event_piece_time_changed_by_user
+        )
         self._slider_volume.valueChanged.connect(self.__event_volume_changed)
         self._slider_time.setRange(0, 100)
+        self._slider_piece_time.setRange(0, 0)  # in ms, set for every piece
         self._slider_volume.setRange(0, 100)
         self._slider_volume.setValue(self._default_volume)
         self._slider_volume.setMinimumWidth(100)
@@ -228,14 +361,23 @@ class PiecesPlayer(QWidget):
         self._layout.addLayout(self._layout_piece_name)
         # rows 1 - 5 (movements of current piece)
         self._layout.addWidget(self._lbl_movements)
-        self._layout.addWidget(self._listwidget_movements)
+        self._layout_movements = QHBoxLayout()
+        self._layout_movements.addWidget(self._listwidget_movements)
+        self._layout_movements.addWidget(self._lbl_cover)
+        self._layout.addLayout(self._layout_movements)
         # row 6 (time)
         self._layout_time = QHBoxLayout()
         self._layout_time.addWidget(self._lbl_time_played)
         self._layout_time.addWidget(self._slider_time)
         self._layout_time.addWidget(self._lbl_time_left)
         self._layout.addLayout(self._layout_time)
-        # row 7 (buttons and volume)
+        # row 7 (time of whole piece)
+        self._layout_piece_time = QHBoxLayout()
+        self._layout_piece_time.addWidget(self._lbl_piece_time_played)
+        self._layout_piece_time.addWidget(self._slider_piece_time)
+        self._layout_piece_time.addWidget(self._lbl_piece_time_left)
+        self._layout.addLayout(self._layout_piece_time)
+        # row 8 (buttons and volume)
         self._layout_buttons_and_volume = QHBoxLayout()
         self._layout_buttons_and_volume.addWidget(self._btn_play_pause)
         self._layout_buttons_and_volume.addWidget(self._btn_previous)
@@ -253,8 +395,12 @@ class PiecesPlayer(QWidget):
         self._KEY_CODES_PLAY_PAUSE = [269025044]
         self._KEY_CODES_NEXT = [269025047]
         self._KEY_CODES_PREVIOUS = [269025046]
-        self._keyboard_listener = keyboard.Listener(on_press=self.__on_press)
-        self._keyboard_listener.start()
+        self._keyboard_listener = None
+        if global_hotkeys:
+            self._keyboard_listener = keyboard.Listener(
+                on_press=self.__on_press
+            )
+            self._keyboard_listener.start()
         QShortcut(QKeySequence('Space'), self, self.__action_play_pause)
 
         # -- various setup --
@@ -263,9 +409,19 @@ class PiecesPlayer(QWidget):
         self._timer.start(100)  # update every 100ms
         self.setMinimumWidth(900)
         self.setMinimumHeight(400)
-        # get directory set(s) input and set up self._pieces
-        # (exec_ means we'll wait for the user input before continuing)
-        DirectorySetChooseDialog(self, self.set_pieces_and_playlist).exec_()
+        if library is not None:  # share pieces of another zone
+            playlist = list(library['pieces'].keys())
+            shuffle(playlist)
+            self.set_pieces_and_playlist(
+                library['pieces'], playlist, library['set_str'], True,
+                library['report']
+            )
+        elif startup is not None:  # sets or directories given on command line
+            self.__load_startup(startup)
+        else:
+            # get directory set(s) input and set up self._pieces
+            # (exec_ means we'll wait for the user input before continuing)
+            DirectorySetChooseDialog(self, self.set_pieces_and_playlist).exec_()
         # skip to next movement / next piece when current one has ended
         self._vlc_events.event_attach(VLCEventType.MediaPlayerEndReached,
                                       self.__event_movement_ended)
@@ -285,11 +441,14 @@ class PiecesPlayer(QWidget):
                         shuffle(self._playlist)
                     return
 
+                self.__record_piece_end()
                 if self._status == 'Playing':
                     self.__action_play_pause()
                 self._current_piece['title'] = ''
                 self._current_piece['files'] = []
                 self._current_piece['play_next'] = -1
+                self.__update_piece_timeline()
+                self.__update_cover()
                 self._lineedit_current_piece.setText('')
                 self.__update_movement_list()
                 self.parentWidget().update_status_bar(
@@ -297,6 +456,7 @@ class PiecesPlayer(QWidget):
                 )
                 return
             else:
+                self.__record_piece_end()
                 if self.parentWidget().get_exit_after_current():
                     self.parentWidget().exit()
                 if self.parentWidget().get_pause_after_current():
@@ -312,6 +472,8 @@ class PiecesPlayer(QWidget):
                 # some pieces only have one movement
                 self._current_piece['play_next'] = \
                     1 if len(self._current_piece['files']) > 1 else -1
+                self.__update_piece_timeline()
+                self.__update_cover()
                 self.__update_vlc_medium(0)
                 self._lineedit_current_piece.setText(
                     create_info_str(
@@ -336,6 +498,7 @@ class PiecesPlayer(QWidget):
             self.parentWidget().set_pause_after_current(False)
         else:
             self._vlc_mediaplayer.play()
+            self.__record_piece_start()
         self.parentWidget().update_status_bar(
             self._status,
             f'{len(self._pieces) - len(self._playlist)}/{len(self._pieces)}'
@@ -353,6 +516,7 @@ class PiecesPlayer(QWidget):
             if not self._vlc_medium:
                 self.__action_next()
             self._vlc_mediaplayer.play()
+            self.__record_piece_start()
             self._btn_play_pause.setIcon(QIcon(get_icon_path('pause')))
             self._status = 'Playing'
         else:
@@ -450,6 +614,28 @@ class PiecesPlayer(QWidget):
 
         self._vlc_mediaplayer.set_position(self._slider_time.value() / 100)
 
+    def __event_piece_time_changed_by_user(self):
+        """ (called when user releases self._slider_piece_time)
+            finds the movement and offset corresponding to the new value of
+            self._slider_piece_time, loads that movement (if it isn't the
+            current one) and seeks to the offset """
+
+        if len(self._current_piece['files']) == 0:
+            return
+
+        index, offset = locate_in_piece_timeline(
+            self._current_piece['timeline'], self._slider_piece_time.value()
+        )
+        if index == self.__get_current_movement_index() and self._vlc_medium:
+            self._vlc_mediaplayer.set_time(offset)
+        else:
+            self._current_piece['play_next'] = index
+            self.__action_next()
+            # vlc ignores set_time until the new medium is actually playing,
+            # so seeking is done by self.__update (must be set after loading
+            # the medium, see self.__update_vlc_medium)
+            self._seek_to = offset
+
     def __get_current_movement_index(self):
         """ returns the index of the current movement in
             self._current_piece['files'] """
@@ -492,10 +678,91 @@ class PiecesPlayer(QWidget):
             files = [i[i.rfind('/') + 4:-4] for i in files]
         self._listwidget_movements.addItems(files)
 
+    def __update_piece_timeline(self):
+        """ computes self._current_piece['timeline'] from the (cached)
+            durations of self._current_piece['files'] and sets the range of
+            self._slider_piece_time accordingly """
+
+        self._current_piece['timeline'] = make_piece_timeline(
+            get_movement_durations(self._current_piece['files'])
+        )
+        self._slider_piece_time.setRange(
+            0, self._current_piece['timeline'][-1]
+        )
+
+    def __update_cover(self):
+        """ shows the cover art of the current piece (hides
+            self._lbl_cover if it has none), thumbnails that have been shown
+            recently are kept in self._cover_pixmaps """
+
+        cover_path = get_piece_cover_path(self._current_piece['files'])
+        pixmap = self._cover_pixmaps.pop(cover_path, None) \
+            if cover_path is not None else None
+        if cover_path is not None and pixmap is None:
+            pixmap = QPixmap(cover_path)
+        if pixmap is None or pixmap.isNull():
+            self._lbl_cover.clear()
+            self._lbl_cover.hide()
+            return
+        self._cover_pixmaps[cover_path] = pixmap  # now most recently shown
+        while len(self._cover_pixmaps) > COVER_PIXMAPS_CACHED:
+            self._cover_pixmaps.popitem(last=False)
+        self._lbl_cover.setPixmap(pixmap)
+        self._lbl_cover.show()
+
+    def __record_piece_start(self):
+        """ records that the current piece has started playing, unless that
+            has been recorded already (called whenever playback starts or
+            resumes) """
+
+        if not self._piece_started and self._current_piece['title'] != '':
+            self.__record_play_event('started')
+            self._piece_started = True
+
+    def __record_piece_end(self):
+        """ records that the current piece has been completed or skipped
+            (called whenever the current piece is left), pieces that never
+            started playing are not recorded at all """
+
+        if self._piece_started:
+            self.__record_play_event(
+                'completed' if self._piece_completed else 'skipped'
+            )
+        self._piece_started = False
+        self._piece_completed = False
+
+    def __record_play_event(self, event):
+        """ records event (see PlayStatistics.record) for the current piece
+            in self._play_statistics """
+
+        piece = self._current_piece['title']
+        if piece == '':  # no current piece (e.g. end of playlist reached)
+            return
+        if event == 'started':
+            self._listened = 0.0
+        try:
+            position = max(self._vlc_mediaplayer.get_time(), 0)
+        except OSError:  # don't know why that occurs sometimes
+            position = 0
+        self._play_statistics.record(
+            event,
+            piece,
+            self._report.get('directory_sets', {}).get(piece[3], ''),
+            self.__get_current_movement_index(),
+            position,
+            int(self._listened * 1000)
+        )
+
     def __update(self):
         """ (periodically called when self._timer emits timeout signal)
             updates various ui elements"""
 
+        # -- count time the current piece has been playing for --
+        now = monotonic()
+        if self._status == 'Playing':
+            self._listened += now - self._last_update
+        self._last_update = now
+
         # -- select currently playing movement in self._listwidget_movements --
         if self._listwidget_movements.count() > 0:
             self._listwidget_movements.item(
@@ -521,6 +788,37 @@ class PiecesPlayer(QWidget):
             except OSError:  # don't know why that occurs sometimes
                 pass
 
+        # -- update text of self._lbl_piece_time_played and
+        # self._lbl_piece_time_left and value of self._slider_piece_time --
+        # (elapsed time of whole piece = start of current movement + time
+        # played of current movement)
+        if self._vlc_medium and len(self._current_piece['files']) > 0:
+            try:
+                timeline = self._current_piece['timeline']
+                piece_time_played = min(
+                    timeline[self.__get_current_movement_index()] +
+                    max(self._vlc_mediaplayer.get_time(), 0),
+                    timeline[-1]
+                )
+                self._lbl_piece_time_played.setText(
+                    get_time_str_from_ms(piece_time_played)
+                )
+                self._lbl_piece_time_left.setText(
+                    f'-{get_time_str_from_ms(timeline[-1] - piece_time_played)}'
+                )
+                # don't reset slider to current position if user is dragging it
+                if not self._slider_piece_time.isSliderDown():
+                    self._slider_piece_time.setValue(piece_time_played)
+            except OSError:  # don't know why that occurs sometimes
+                pass
+
+            # seek to the position the user chose on self._slider_piece_time
+            # as soon as the movement it lies in is playing
+            if self._seek_to is not None and \
+               self._vlc_mediaplayer.is_playing():
+                self._vlc_mediaplayer.set_time(self._seek_to)
+                self._seek_to = None
+
         # -- update value of self._slider_time --
         # don't reset slider to current position if user is dragging it
         if not self._slider_time.isSliderDown():
@@ -532,15 +830,175 @@ class PiecesPlayer(QWidget):
 
         if self._skip_to_next:
             self._skip_to_next = False
+            if self._current_piece['play_next'] == -1:  # last movement ended
+                self._piece_completed = True
             self.__action_next()
 
+        # -- use the complete library once it has been scanned --
+        if self._background_scan is not None and (
+            self._background_scan['result'] is not None or
+            self._background_scan['error'] is not None
+        ):
+            self.__merge_background_scan()
+
+    def __stage_upcoming(self, files_index):
+        """ lets self._staging_cache copy the movements of the current piece
+            after the one at files_index and the movements of the next piece
+            to local disk """
+
+        files = self._current_piece['files'][files_index + 1:]
+        if len(self._playlist) > 0:
+            files += [p[1:-1] for p in self._pieces[self._playlist[0]]]
+        self._staging_cache.stage(self, files)
+
+    def __load_startup(self, startup):
+        """ starts playing the pieces of the first directory of
+            startup['directory_sets'] (a random one if shuffling, the one
+            containing startup['start'] if given, looked up in the tag index
+            if it's not the first one) right away and scans the other
+            directories in the background
+            (see self.__merge_background_scan) """
+
+        directories = list(startup['directory_sets'].keys())
+        if startup['shuffle'] and startup['start'] is None:
+            shuffle(directories)
+        self._btn_loop.setChecked(startup['loop'])
+
+        # read the first directory with something to play (without the tag
+        # index, loading it can take longer than reading one directory)
+        pieces, report = {}, {}
+        for directory in directories:
+            try:
+                pieces, report = scan_pieces_from_directories([directory])
+            except OSError:  # directory doesn't exist (anymore), ...
+                continue
+            if len(pieces) > 0:
+                break
+        if len(pieces) == 0:  # fall back to choosing sets in the dialog
+            DirectorySetChooseDialog(self, self.set_pieces_and_playlist).exec_()
+            return
+
+        playlist = list(pieces.keys())
+        start_index = 0
+        if startup['start'] is not None:
+            start_index = find_piece(playlist, startup['start'])
+        elif startup['shuffle']:  # don't always start with the first piece
+            shuffle(playlist)
+        if start_index is None:
+            # look the start piece up in the tag index instead of reading
+            # all directories before playing anything
+            tag_index = load_tag_index()
+            directory = find_piece_directory(
+                tag_index, directories, startup['start']
+            )
+            if directory is not None:
+                try:
+                    pieces, report = scan_pieces_from_directories(
+                        [directory], tag_index=tag_index
+                    )
+                    playlist = list(pieces.keys())
+                    start_index = find_piece(playlist, startup['start'])
+                except OSError:
+                    pass
+        if start_index is None:  # play from the first directory instead
+            QMessageBox.warning(
+                self,
+                'Start piece not found',
+                f'No piece containing "{startup["start"]}" found (in the '
+                f'tag index), starting with the first piece instead.'
+            )
+            start_index = 0
+
+        first = playlist.pop(start_index)  # stays first when shuffling
+        if startup['shuffle']:
+            shuffle(playlist)
+        else:  # continue in order after the start piece
+            playlist = playlist[start_index:]
+        report['directory_sets'] = startup['directory_sets']
+        self.set_pieces_and_playlist(
+            pieces, [first] + playlist, startup['set_str'],
+            startup['shuffle'], report
+        )
+        self.__action_play_pause()
+
+        background_scan = {'start_piece': first, 'result': None, 'error': None}
+
+        def scan():
+            # anything going wrong must end up in the warning, or the scan
+            # would just never finish from our point of view
+            try:
+                background_scan['result'] = scan_pieces_from_directory_sets(
+                    startup['directory_sets']
+                )
+            except Exception as error:
+                background_scan['error'] = f'{type(error).__name__}: {error}'
+
+        self._background_scan = background_scan
+        Thread(target=scan, name='scan', daemon=True).start()
+
+    def __merge_background_scan(self):
+        """ (called by self.__update once self._background_scan is done)
+            replaces the pieces of the first directory with all scanned
+            pieces and adds the ones that haven't been played yet to the
+            playlist, without interrupting the current piece """
+
+        background_scan = self._background_scan
+        self._background_scan = None
+        if background_scan['error'] is not None:
+            QMessageBox.warning(
+                self,
+                'Scanning directory set(s) failed',
+                f'{background_scan["error"]}\n\nOnly the pieces found so '
+                f'far are in the playlist.'
+            )
+            return
+
+        pieces, report = background_scan['result']
+        # pieces of the first directory that have already been played (or
+        # are playing right now)
+        played = set(self._pieces.keys()) - set(self._playlist)
+        playlist = list(pieces.keys())
+        if not self._shuffled and background_scan['start_piece'] in pieces:
+            # continue in order after the piece we started with
+            playlist = playlist[
+                playlist.index(background_scan['start_piece']) + 1:
+            ]
+        playlist = [p for p in playlist if p not in played]
+        if self._shuffled:
+            shuffle(playlist)
+
+        self._pieces = freeze_pieces(pieces)
+        self._report = report
+        if self._current_piece['title'] == '':  # end was reached meanwhile
+            if len(playlist) > 0:
+                self.set_pieces_and_playlist(
+                    pieces, playlist, self._set_str, self._shuffled, report
+                )
+                self.__action_play_pause()
+            return
+        self._playlist = playlist
+        self.parentWidget().update_status_bar(
+            self._status,
+            f'{len(self._pieces) - len(self._playlist)}/{len(self._pieces)}'
+        )
+
     def __update_vlc_medium(self, files_index):
+        # a pending seek belongs to the medium being replaced (set again by
+        # self.__event_piece_time_changed_by_user after loading the new one)
+        self._seek_to = None
+        path = self._current_piece['files'][files_index]
+        # play from local copy if there already is one
+        if self.parentWidget().get_stage_upcoming():
+            self.__stage_upcoming(files_index)
+            path = self._staging_cache.get_path(path)
         old_medium = self._vlc_medium
-        self._vlc_medium = self._vlc_instance.media_new(
-            self._current_piece['files'][files_index]
-        )
+        self._vlc_medium = self._vlc_instance.media_new(path)
         self._vlc_medium.parse()
         self._vlc_mediaplayer.set_media(self._vlc_medium)
+        if self._output_device is not None:
+            self._vlc_mediaplayer.audio_output_device_set(
+                None, self._output_device
+            )
         if old_medium:  # only release if not None
             old_medium.release()
 
@@ -549,23 +1007,70 @@ class PiecesPlayer(QWidget):
 
         return self._history
 
+    def get_library(self):
+        """ getter function for parent widget, returns everything another
+            PiecesPlayer needs to share our (immutable) pieces (None if no
+            directory set is loaded) """
+
+        if len(self._pieces) == 0:
+            return None
+        return {
+            'pieces': self._pieces,
+            'set_str': self._set_str,
+            'report': self._report
+        }
+
+    def get_output_devices(self):
+        """ returns a list of (device id, description) of all audio output
+            devices our media player can use """
+
+        devices = []
+        device_list = self._vlc_mediaplayer.audio_output_device_enum()
+        device = device_list
+        while device:
+            devices.append((
+                device.contents.device.decode(),
+                device.contents.description.decode()
+            ))
+            device = device.contents.next
+        if device_list:
+            libvlc_audio_output_device_list_release(device_list)
+        return devices
+
+    def get_report(self):
+        """ getter function for parent widget """
+
+        return self._report
+
     def get_set_str(self):
         """ getter function for parent widget """
 
         return self._set_str if self._set_str != '' \
             else 'No directory set loaded.'
 
-    def set_pieces_and_playlist(self, pieces, playlist, set_str, shuffled):
+    def is_scanning(self):
+        """ returns whether the directory sets are still being scanned in
+            the background (see self.__load_startup), i.e. only some of the
+            pieces are loaded yet """
+
+        return self._background_scan is not None
+
+    def set_pieces_and_playlist(self, pieces, playlist, set_str, shuffled,
+                                report=None):
         """ needed so that DirectorySetChooseDialog can set our self._pieces
             and self._playlist """
 
         # just to be sure
-        if isinstance(pieces, dict) and isinstance(playlist, list):
+        if isinstance(pieces, Mapping) and isinstance(playlist, list):
+            # newly chosen sets replace whatever is still being scanned
+            self._background_scan = None
+            self.__record_piece_end()  # if a piece was loaded already
             self._vlc_mediaplayer.stop()
             self._set_str = set_str
-            self._pieces = pieces
+            self._pieces = freeze_pieces(pieces)
             self._playlist = playlist
             self._shuffled = shuffled
+            self._report = report if report is not None else {}
             self._current_piece['title'] = self._playlist.pop(0)
             self._current_piece['files'] = [
                 p.replace('"', '') for p in self._pieces[
@@ -574,6 +1079,8 @@ class PiecesPlayer(QWidget):
             ]
             self._current_piece['play_next'] = \
                 1 if len(self._current_piece['files']) > 1 else -1
+            self.__update_piece_timeline()
+            self.__update_cover()
             self._lineedit_current_piece.setText(
                 create_info_str(
                     self._current_piece['title'], self._current_piece['files']
@@ -584,28 +1091,72 @@ class PiecesPlayer(QWidget):
             self._history[datetime.now().strftime('%H:%M:%S')] = \
                 self._lineedit_current_piece.text()
 
-    def exit(self):
-        """ exits cleanly """
+    def set_output_device(self, device):
+        """ makes our media player use the audio output device with the given
+            id (see get_output_devices) """
 
+        self._output_device = device
+        self._vlc_mediaplayer.audio_output_device_set(None, device)
+
+    def exit(self):
+        """ exits cleanly (the vlc instance is released by the parent
+            widget, as it may be shared with other zones) """
+
+        # don't lose the time the current piece has been listened to
+        self.__record_piece_end()
+        # self.__update must not touch the media player once it's released
+        self._timer.stop()
+        # other zones might still use the staging cache
+        self._staging_cache.stage(self, [])
         try:  # don't know why that occurs sometimes
             self._vlc_mediaplayer.stop()
             self._vlc_mediaplayer.release()
-            self._vlc_instance.release()
         except OSError:
             pass
 
-        self._keyboard_listener.stop()
+        if self._keyboard_listener:
+            self._keyboard_listener.stop()
 
 
 class PiecesMainWindow(QMainWindow):
     """ main window of this application, wrapping a menu and status bar around
-        the PiecesPlayer widget """
-
-    def __init__(self):
-        """ standard constructor: set up ui elements and layout """
+        the PiecesPlayer widget
+
+        every PiecesMainWindow is a "zone": the first one creates the vlc
+        instance, further zones (opened from its menu) share that instance and
+        the loaded pieces, but have their own playlist and output device """
+
+    def __init__(self, vlc_instance=None, staging_cache=None,
+                 play_statistics=None, library=None, startup=None):
+        """ standard constructor: set up ui elements and layout
+                - vlc_instance: instance to share (None for the main zone,
+                  which creates and later releases the instance)
+                - staging_cache: StagingCache to share (None for the main
+                  zone, which creates and later closes it)
+                - play_statistics: PlayStatistics to share (None for the main
+                  zone, which creates and later saves it)
+                - library: see PiecesPlayer
+                - startup: see PiecesPlayer """
 
         super(PiecesMainWindow, self).__init__()
 
+        # -- zone setup --
+        self._is_main_zone = vlc_instance is None
+        self._vlc_instance = VLCInstance() if self._is_main_zone \
+            else vlc_instance
+        self._staging_cache = StagingCache(
+            STAGING_DIRECTORY, STAGING_MAX_BYTES
+        ) if self._is_main_zone else staging_cache
+        self._play_statistics = PlayStatistics(STATISTICS_DIRECTORY) \
+            if self._is_main_zone else play_statistics
+        self._zones = []  # PiecesMainWindows opened from this one
+        # set by self.__action_exit, which runs again when it closes the
+        # window (see self.closeEvent) but must only release everything once
+        self._exited = False
+        # profiles the whole process, so only needed once
+        self._profiler = SamplingProfiler(PROFILES_DIRECTORY) \
+            if self._is_main_zone else None
+
         # -- create and setup statusbar elements --
         self._statuslbl_play_pause = QLabel('Paused')
         self._statuslbl_playlist_position = QLabel('Position in playlist: 0/?')
@@ -625,6 +1176,12 @@ class PiecesMainWindow(QMainWindow):
             QKeySequence('Ctrl+E')
         )
         self._menu_options_action_exit_after_current.setCheckable(True)
+        self._menu_options_action_stage_upcoming = self._menu_options.addAction(
+            'Copy upcoming movements to local disk',
+            None,  # "called" when clicked, needed for complying with signature
+            QKeySequence('Ctrl+S')
+        )
+        self._menu_options_action_stage_upcoming.setCheckable(True)
         self._menu_options.addAction(
             QIcon(get_icon_path('info')),
             'Show loaded directory set(s)',
@@ -637,12 +1194,43 @@ class PiecesMainWindow(QMainWindow):
             self.__action_reload_sets,
             QKeySequence('Ctrl+L')
         )
+        self._menu_options.addAction(
+            QIcon(get_icon_path('audio-file')),
+            'Show duplicates and collisions',
+            self.__action_show_report,
+            QKeySequence('Ctrl+R')
+        )
         self._menu_options.addAction(
             QIcon(get_icon_path('history')),
             'Show history',
             self.__action_show_history,
             QKeySequence('Ctrl+H')
         )
+        self._menu_options.addAction(
+            QIcon(get_icon_path('history')),
+            'Show statistics',
+            self.__action_show_statistics,
+            QKeySequence('Ctrl+T')
+        )
+        self._menu_options.addAction(
+            QIcon(get_icon_path('music')),
+            'Open new zone',
+            self.__action_new_zone,
+            QKeySequence('Ctrl+N')
+        )
+        self._menu_options.addAction(
+            QIcon(get_icon_path('volume-high')),
+            'Choose output device',
+            self.__action_choose_output_device,
+            QKeySequence('Ctrl+O')
+        )
+        if self._is_main_zone:
+            self._menu_options_action_profile = self._menu_options.addAction(
+                'Record profile',
+                self.__action_toggle_profiling,
+                QKeySequence('Ctrl+Shift+P')
+            )
+            self._menu_options_action_profile.setCheckable(True)
         self._menu_options.addAction(
             QIcon(get_icon_path('exit')),
             'Exit',
@@ -657,9 +1245,87 @@ class PiecesMainWindow(QMainWindow):
         # -- various setup --
         self.setWindowIcon(QIcon(get_icon_path('music-folder')))
         self.setWindowTitle('Pieces Player')
-        self._widget_player = PiecesPlayer(self)
+        self._widget_player = PiecesPlayer(
+            self, self._vlc_instance, self._staging_cache,
+            self._play_statistics, library, self._is_main_zone, startup
+        )
         self.setCentralWidget(self._widget_player)
 
+    def __action_choose_output_device(self):
+        """ (called when menu action "Choose output device" is clicked)
+            lets the user choose the audio output device of this zone """
+
+        devices = self._widget_player.get_output_devices()
+        if len(devices) == 0:
+            QMessageBox.information(
+                self,
+                'Output device',
+                'No audio output devices found.'
+            )
+            return
+        description, ok = QInputDialog.getItem(
+            self,
+            'Output device',
+            'Please choose the audio output device of this zone:',
+            [d[1] for d in devices],
+            0,
+            False
+        )
+        if ok:
+            self._widget_player.set_output_device(
+                devices[[d[1] for d in devices].index(description)][0]
+            )
+
+    def __action_new_zone(self):
+        """ (called when menu action "Open new zone" is clicked)
+            opens a new PiecesMainWindow sharing our vlc instance and pieces """
+
+        library = self._widget_player.get_library()
+        if library is None:
+            QMessageBox.information(
+                self,
+                'Open new zone',
+                'No directory set loaded.'
+            )
+            return
+        # zones share our pieces as they are, so they must be complete (and
+        # the very mapping we keep, see freeze_pieces)
+        if self._widget_player.is_scanning():
+            QMessageBox.information(
+                self,
+                'Open new zone',
+                'The directory set(s) are still being scanned, please try '
+                'again in a moment.'
+            )
+            return
+        zone = PiecesMainWindow(
+            self._vlc_instance, self._staging_cache, self._play_statistics,
+            library
+        )
+        # free closed zones right away and forget about them
+        zone.setAttribute(Qt.WA_DeleteOnClose)
+        zone.destroyed.connect(partial(self._zones.remove, zone))
+        # same behaviour as the zone it was opened from
+        zone.set_stage_upcoming(self.get_stage_upcoming())
+        zone.setWindowTitle(f'Pieces Player (zone {len(self._zones) + 2})')
+        zone.show()
+        self._zones.append(zone)
+
+    def __action_toggle_profiling(self):
+        """ (called when menu action "Record profile" is clicked)
+            starts or stops recording a profile of the whole application and
+            shows where it was written to in the status bar """
+
+        if self._menu_options_action_profile.isChecked():
+            self._profiler.start()
+            self.statusBar().showMessage('Recording profile...')
+        else:
+            path = self._profiler.stop()
+            self.statusBar().showMessage(
+                f'Profile written to {path}.pstats and {path}.collapsed',
+                10000  # ms
+            )
+
     def __action_reload_sets(self):
         """ (called when menu action "Load new directory set(s)" is clicked)
             opens a DirectorySetChooseDialog, which sets self._pieces and
@@ -684,7 +1350,44 @@ class PiecesMainWindow(QMainWindow):
                 'Nothing has been played yet.'
             )
         else:
-            HistoryDialog(self, make_history_string_from_dict(history)).exec_()
+            TextDialog(
+                self,
+                make_history_string_from_dict(history),
+                'Playing History'
+            ).exec_()
+
+    def __action_show_report(self):
+        """ (gets called when 'show duplicates and collisions' menu entry is
+            clicked)
+            shows a TextDialog containing the report created while scanning
+            the loaded directory set(s) """
+
+        report = self._widget_player.get_report()
+        if report == {}:
+            QMessageBox.information(
+                self,
+                'Duplicates and collisions',
+                'No directory set loaded.'
+            )
+        else:
+            TextDialog(
+                self,
+                make_report_string_from_dict(report),
+                'Duplicates and collisions'
+            ).exec_()
+
+    def __action_show_statistics(self):
+        """ (gets called when 'show statistics' menu entry is clicked)
+            shows a TextDialog containing the (precomputed) play statistics
+            of all zones """
+
+        TextDialog(
+            self,
+            make_statistics_string_from_dict(
+                self._play_statistics.get_rollups()
+            ),
+            'Statistics'
+        ).exec_()
 
     def __action_show_set(self):
         """ (gets called when 'show history' menu entry is clicked)
@@ -700,10 +1403,26 @@ class PiecesMainWindow(QMainWindow):
 
     def __action_exit(self):
         """ (called when menu action "Exit" is clicked)
-            exits cleanly by calling exit function of the central widget and
+            exits cleanly by closing all zones opened from this one, calling
+            exit function of the central widget, releasing the vlc instance
+            and closing the staging cache (if they were created by us) and
             then closing """
 
+        if self._exited:
+            return
+        self._exited = True
+        # (closed zones have removed themselves from self._zones already)
+        for zone in list(self._zones):
+            zone.exit()
         self._widget_player.exit()
+        if self._is_main_zone:
+            self._profiler.stop()  # don't lose a running profile
+            try:  # don't know why that occurs sometimes
+                self._vlc_instance.release()
+            except OSError:
+                pass
+            self._staging_cache.close()
+            self._play_statistics.save()
         self.close()
 
     def closeEvent(self, event):
@@ -718,6 +1437,13 @@ class PiecesMainWindow(QMainWindow):
     def exit(self):
         self.__action_exit()
 
+    def toggle_profiling(self):
+        """ starts or stops recording a profile, just like the menu action
+            (e.g. on a signal when there is no way to reach the menu) """
+
+        if self._is_main_zone:
+            self._menu_options_action_profile.trigger()
+
     def get_pause_after_current(self):
         """ getter function for self._widget_player """
 
@@ -728,6 +1454,16 @@ class PiecesMainWindow(QMainWindow):
 
         self._menu_options_action_pause_after_current.setChecked(bool_val)
 
+    def get_stage_upcoming(self):
+        """ getter function for self._widget_player """
+
+        return self._menu_options_action_stage_upcoming.isChecked()
+
+    def set_stage_upcoming(self, bool_val):
+        """ setter function for zones opened from this one """
+
+        self._menu_options_action_stage_upcoming.setChecked(bool_val)
+
     def get_exit_after_current(self):
         """ getter function for self._widget_player """
 
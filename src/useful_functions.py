@@ -1,17 +1,55 @@
+import json
 import os
-from mutagen.easyid3 import EasyID3
-from datetime import time
+import tempfile
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+from hashlib import blake2b
+from threading import get_ident
+from types import MappingProxyType
+from mutagen import MutagenError
+from mutagen.id3 import ID3
+from mutagen.mp3 import MP3
+
+from covers import (
+    can_make_thumbnails, evict_covers, find_folder_cover, get_cover_path,
+    store_cover
+)
 
 
 ICON_SIZE = '64px'
+# file the tags of all scanned files are kept in (see load_tag_index)
+TAG_INDEX_PATH = '../index/tags.json'
+# directory profiles recorded with SamplingProfiler are written to
+PROFILES_DIRECTORY = '../profiles'
+# directory the event log and rollups of PlayStatistics are kept in
+STATISTICS_DIRECTORY = '../statistics'
+# number of bytes hashed at the start and end of a file by get_audio_fingerprint
+FINGERPRINT_CHUNK_SIZE = 64 * 1024
+# local directory the StagingCache that upcoming movements are copied to
+# (useful for slow network mounts) creates its own directory in, and the
+# maximum size of the cache (in bytes)
+STAGING_DIRECTORY = tempfile.gettempdir()
+STAGING_MAX_BYTES = 2 * 1024 ** 3
+# directory cover art thumbnails are kept in, their maximum width and height
+# (in px) and the maximum size of all of them together (in bytes, least
+# recently used thumbnails are evicted after scanning and whenever a cover
+# has to be read again while playing, see evict_covers)
+COVERS_DIRECTORY = '../covers'
+COVER_SIZE = 200
+COVERS_MAX_BYTES = 50 * 1024 ** 2
 
+# {<file>: <duration in ms>, ...}, filled by get_movement_durations
+_movement_durations = {}
+# {<file>: <key of its cover thumbnail, None if it has none>, ...}, seeded
+# while scanning and filled by get_piece_cover_path
+_cover_keys = {}
 
-def get_pieces_from_sets(sets):
-    """	takes a list of set filenames, reads the directories from those sets
-        and then gets all the pieces which are in those directories """
 
-    directories = []
-    pieces = {}
+def iter_directories_from_sets(sets):
+    """ takes a list of set filenames and yields (directory, set name) for
+        all directories listed in those sets (with their prefixes applied) """
+
     prefix = ''
 
     for path in sets:
@@ -23,33 +61,396 @@ def get_pieces_from_sets(sets):
                 prefix = line[7:-1]
             # ignore commented or empty lines
             elif not ((line[0] == '#') or (line == '\n')):
-                directories.append(prefix + line.replace('\n', ''))
+                yield prefix + line.replace('\n', ''), path[:-4]
+
+
+def get_directories_from_sets(sets):
+    """ takes a list of set filenames and returns the directories listed in
+        those sets (with their prefixes applied) """
+
+    return [d for d, _ in iter_directories_from_sets(sets)]
+
+
+def get_audio_fingerprint(path):
+    """ returns a fast fingerprint of the audio data of the mp3 file at path:
+        a hash over the size of the audio data and its first and last
+        FINGERPRINT_CHUNK_SIZE bytes (ID3v2 and ID3v1 tags are skipped, so
+        copies of a file that were tagged differently still match) """
+
+    with open(path, 'rb') as input_file:
+        header = input_file.read(10)
+        start = 0
+        if len(header) == 10 and header.startswith(b'ID3'):
+            # tag size is stored as a "syncsafe" integer (7 bits per byte)
+            start = 10 + (header[6] << 21 | header[7] << 14 |
+                          header[8] << 7 | header[9])
+            if header[5] & 0x10:  # tag has a footer
+                start += 10
+        end = input_file.seek(0, os.SEEK_END)
+        if end - start >= 128:
+            input_file.seek(end - 128)
+            if input_file.read(3) == b'TAG':  # ID3v1 tag at the end
+                end -= 128
+        end = max(start, end)
+
+        digest = blake2b(str(end - start).encode(), digest_size=16)
+        input_file.seek(start)
+        digest.update(input_file.read(min(FINGERPRINT_CHUNK_SIZE, end - start)))
+        if end - start > FINGERPRINT_CHUNK_SIZE:
+            input_file.seek(max(start, end - FINGERPRINT_CHUNK_SIZE))
+            digest.update(input_file.read(
+                min(FINGERPRINT_CHUNK_SIZE, end - start)
+            ))
+
+    return digest.hexdigest()
+
+
+def load_tag_index(path=TAG_INDEX_PATH):
+    """ returns the tag index stored at path ({} if there is none yet or it
+        can't be read), see read_tags for the format of its entries """
+
+    try:
+        with open(path, encoding='utf-8') as input_file:
+            return json.load(input_file)
+    except (OSError, ValueError):  # ValueError: not valid json
+        return {}
+
+
+def save_tag_index(tag_index, path=TAG_INDEX_PATH):
+    """ stores tag_index at path (replacing the old index only when the new
+        one has been written completely) """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # temporary file of our own, the index might be saved by several
+    # processes (player, indexer) or threads (background scan) at once
+    tmp_path = f'{path}.{os.getpid()}.{get_ident()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as output_file:
+        json.dump(tag_index, output_file)
+    os.replace(tmp_path, path)
+
+
+def store_embedded_cover(tags):
+    """ stores a thumbnail of the cover art (APIC frame, the front cover if
+        there are several) in the given ID3 tags and returns its key (None if
+        there is no cover art), see store_cover """
+
+    pictures = tags.getall('APIC') if tags is not None else []
+    if not pictures:
+        return None
+    # type 3 is the front cover
+    picture = next((p for p in pictures if p.type == 3), pictures[0])
+    return store_cover(picture.data, COVERS_DIRECTORY, COVER_SIZE)
+
+
+def read_embedded_cover(path):
+    """ stores a thumbnail of the cover art embedded in the mp3 file at path
+        (only its ID3 tag is read) and returns its key (None if there is
+        none), see store_embedded_cover """
+
+    try:
+        return store_embedded_cover(ID3(path))
+    except (MutagenError, OSError):  # MutagenError: no (valid) ID3 tag
+        return None
+
+
+def store_folder_cover(path):
+    """ stores a thumbnail of the image file at path (e.g. folder.jpg, see
+        find_folder_cover) and returns its key (None if it can't be read) """
+
+    try:
+        with open(path, 'rb') as input_file:
+            data = input_file.read()
+    except OSError:
+        return None
+    return store_cover(data, COVERS_DIRECTORY, COVER_SIZE)
+
+
+def read_tags(path, stat=None):
+    """ reads the tags, the duration and the cover art of the mp3 file at
+        path (in one go) and returns them as an entry of the tag index:
+            {'mtime': <mtime in ns>, 'size': <size in bytes>,
+             'title': <TIT2 tag, None if missing>, 'artist': <str>,
+             'album': <str>, 'length': <duration in ms>,
+             'cover': <key of the thumbnail of the embedded cover art, None
+                       if there is none>}
+        ('cover' is missing if no thumbnails can be made, see
+        can_make_thumbnails)
+        (stat: result of os.stat(path), if already known) """
+
+    stat = stat or os.stat(path)
+    entry = {
+        'mtime': stat.st_mtime_ns, 'size': stat.st_size,
+        'title': None, 'artist': '', 'album': '', 'length': 0
+    }
+    try:
+        audio = MP3(path)
+    except MutagenError:  # not a valid mp3 file
+        return entry
+    tags = audio.tags  # None if file doesn't have an ID3 tag
+    if tags is not None:
+        if 'TIT2' in tags:
+            entry['title'] = tags['TIT2'].text[0]
+        if 'TPE1' in tags:
+            entry['artist'] = tags['TPE1'].text[0].strip()
+        if 'TALB' in tags:
+            entry['album'] = tags['TALB'].text[0].strip()
+    entry['length'] = int(audio.info.length * 1000)
+    if can_make_thumbnails():
+        entry['cover'] = store_embedded_cover(tags)
+    return entry
+
+
+def read_tags_of_directory(directory, tag_index=None):
+    """ returns ({<file>: <entry>, ...}, <number of files read>) for all mp3
+        files in directory (sorted by filename), entries of files that
+        haven't changed since they were put into tag_index are taken from
+        there instead of reading the file again
+
+        files without embedded cover art get the folder cover of directory
+        (see find_folder_cover), if there is one """
+
+    entries = {}
+    n_read = 0
+    filenames = sorted(os.listdir(directory))
+    folder_cover = find_folder_cover(directory, filenames)
+    folder_cover_key = None  # only stored once it's needed
+    thumbnails = can_make_thumbnails()
+    for filename in filenames:
+        if '.mp3' not in filename:  # ignore non-mp3 files
+            continue
+        path = os.path.join(directory, filename)
+        stat = os.stat(path)
+        entry = tag_index.get(path) if tag_index else None
+        cover_read = False  # whether entry['cover'] has just been set
+        if entry is None or entry['mtime'] != stat.st_mtime_ns \
+           or entry['size'] != stat.st_size:
+            entry = read_tags(path, stat)
+            n_read += 1
+            cover_read = thumbnails
+        elif thumbnails and 'cover' not in entry:
+            # indexed when no thumbnails could be made (e.g. by indexer.py
+            # without Pillow), the other tags are still valid, so only the
+            # cover is read (once, it's kept in the tag index from now on)
+            entry['cover'] = read_embedded_cover(path)
+            cover_read = True
+        if cover_read and entry['cover'] is None and folder_cover:
+            if folder_cover_key is None:
+                folder_cover_key = store_folder_cover(folder_cover)
+            entry['cover'] = folder_cover_key
+        entries[path] = entry
+    return entries, n_read
+
+
+def update_tag_index(tag_index, directories, entries):
+    """ puts entries (as returned by read_tags_of_directory for all of
+        directories) into tag_index, removing entries of files in those
+        directories that don't exist anymore """
+
+    directories = set(directories)
+    for path in [
+        p for p in tag_index
+        if os.path.dirname(p) in directories and p not in entries
+    ]:
+        del tag_index[path]
+    tag_index.update(entries)
+
+
+def get_directory_sets(sets, directories=()):
+    """ takes a list of set filenames and a list of further directories and
+        returns {<directory>: <name of set it is listed in>, ...} for all of
+        them in order ('' for the further directories that aren't listed in
+        any of the sets) """
+
+    # first set wins if a directory is listed in more than one
+    directory_sets = {}
+    for directory, set_name in iter_directories_from_sets(sets):
+        directory_sets.setdefault(directory, set_name)
+    for directory in directories:
+        directory_sets.setdefault(directory, '')
+    return directory_sets
+
+
+def scan_pieces_from_sets(sets, fingerprint=False):
+    """ takes a list of set filenames, reads the directories from those sets
+        and then gets all the pieces which are in those directories
+        (see scan_pieces_from_directory_sets) """
+
+    return scan_pieces_from_directory_sets(
+        get_directory_sets(sets), fingerprint
+    )
+
+
+def scan_pieces_from_directory_sets(directory_sets, fingerprint=False):
+    """ gets all the pieces which are in the directories of directory_sets
+        (as returned by get_directory_sets, see
+        scan_pieces_from_directories), using and updating the tag index at
+        TAG_INDEX_PATH
+
+        the report additionally contains
+        'directory_sets': {<directory>: <name of set it is listed in>} """
+
+    tag_index = load_tag_index()
+    pieces, report = scan_pieces_from_directories(
+        list(directory_sets.keys()), fingerprint, tag_index
+    )
+    report['directory_sets'] = directory_sets
+    try:
+        save_tag_index(tag_index)
+    except OSError:  # not being able to save the index is not fatal
+        pass
+    evict_covers(COVERS_DIRECTORY, COVERS_MAX_BYTES)
+    return pieces, report
+
+
+def get_piece_title(id3_text):
+    """ returns the title of the piece a file with the given TIT2 tag
+        belongs to ('<piece title> - <movement title>') """
+
+    title = id3_text[:id3_text.find(' - ')] if (' - ' in id3_text) \
+        else id3_text
+    return title.strip()  # remove any spaces at beginning/end
+
+
+def find_piece(pieces, text):
+    """ returns the index of the first of pieces ((title, artist, album,
+        directory) tuples) whose title contains text (case-insensitive), None
+        if there is none """
+
+    text = text.lower()
+    return next(
+        (i for i, p in enumerate(pieces) if text in p[0].lower()), None
+    )
+
+
+def find_piece_directory(tag_index, directories, text):
+    """ returns the first of directories containing a piece whose title
+        contains text (case-insensitive) according to tag_index, without
+        reading any files (None if there is none in tag_index) """
+
+    text = text.lower()
+    # {directory: [titles of its files, sorted by filename]}
+    directory_titles = {d: [] for d in directories}
+    for path, entry in sorted(tag_index.items()):
+        directory = os.path.dirname(path)
+        if directory in directory_titles and entry['title'] is not None:
+            directory_titles[directory].append(entry['title'])
+    for directory, titles in directory_titles.items():
+        if any(text in get_piece_title(t).lower() for t in titles):
+            return directory
+    return None
+
+
+def scan_pieces_from_directories(directories, fingerprint=False,
+                                 tag_index=None):
+    """ gets all the pieces which are in the given directories
+
+        returns (pieces, report):
+            - pieces: {(title, artist, album, directory): [files], ...},
+              so the same work recorded in different directories (or by
+              different artists) stays separate
+            - report: {'duplicates': {(title, artist, album): [directories]},
+                       'collisions': {title: [pieces]},
+                       'non_adjacent': [pieces],
+                       'identical_files': [[files]],
+                       'missing_title': [files],
+                       'files_scanned': <number of mp3 files>,
+                       'files_read': <number of files whose tags were read>}
+        if fingerprint is True, a fast fingerprint of every file is computed
+        in parallel while scanning to find identical files
+        if tag_index is given, tags (and fingerprints) of unchanged files are
+        taken from it and it is updated with everything that was read """
+
+    pieces = {}
+    # indices built up while scanning, used for the report
+    works = {}  # {(title, artist, album): [directories]}
+    titles = {}  # {title: [pieces]}
+    non_adjacent = []
+    missing_title = []
+    all_entries = {}  # {file: entry} (see read_tags)
+    n_read = 0
+    fingerprints = {}  # {file: future of get_audio_fingerprint}
+    executor = ThreadPoolExecutor() if fingerprint else None
 
     for directory in directories:
-        # ID3-title (piece-specific, not per-movement) of last file
-        # ('' if new directory, used to decide whether we found a new piece)
-        id3 = ''
-        for filename in sorted(os.listdir(directory)):
-            if '.mp3' in filename:  # ignore non-mp3 files
-                audio = EasyID3(os.path.join(directory, filename))
-                try:
-                    id3_text = audio['title'][0]
-                except KeyError:
-                    print(os.path.join(directory, filename) + ' does not have a TIT2 ID3 tag')
-                    continue
-                n_id3 = id3_text[:id3_text.find(' - ')] if (' - ' in id3_text) else id3_text
-                # ID3-title of current file
-                n_id3 = n_id3.strip()  # remove any spaces at beginning/end
-                if n_id3 != id3:  # seems to be a new piece
-                    id3 = n_id3  # set new ID3-title because new piece
-                    # new piece so we need to create a new empty list that we
-                    # can append files to
-                    pieces[id3] = []
-                pieces[id3].append(
-                    '"' + os.path.join(directory, filename) + '"'
-                )  # quotes needed for windows file name handling
-
-    return pieces
+        entries, n_directory_read = read_tags_of_directory(directory, tag_index)
+        all_entries.update(entries)
+        n_read += n_directory_read
+        # identity of the piece the last file belonged to
+        # (None if new directory, used to decide whether we found a new piece)
+        piece = None
+        for path, entry in entries.items():
+            # seed caches of get_movement_durations and get_piece_cover_path
+            _movement_durations[path] = entry['length']
+            if 'cover' in entry:
+                _cover_keys[path] = entry['cover']
+            id3_text = entry['title']
+            if id3_text is None:
+                missing_title.append(path)
+                continue
+            if executor and 'fingerprint' not in entry:
+                fingerprints[path] = executor.submit(
+                    get_audio_fingerprint, path
+                )
+            title = get_piece_title(id3_text)
+            n_piece = (title, entry['artist'], entry['album'], directory)
+            if n_piece not in pieces:  # new piece
+                pieces[n_piece] = []
+                works.setdefault(n_piece[:3], []).append(directory)
+                titles.setdefault(title, []).append(n_piece)
+            elif n_piece != piece and n_piece not in non_adjacent:
+                # files of this piece are not next to each other
+                non_adjacent.append(n_piece)
+            piece = n_piece
+            # quotes needed for windows file name handling
+            pieces[piece].append('"' + path + '"')
+
+    identical_files = {}  # {fingerprint: [files]}
+    if executor:
+        for path, future in fingerprints.items():
+            try:
+                all_entries[path]['fingerprint'] = future.result()
+            except OSError:  # file vanished or can't be read, just skip it
+                pass
+        executor.shutdown()
+        for path, entry in all_entries.items():
+            if 'fingerprint' in entry and entry['title'] is not None:
+                identical_files.setdefault(
+                    entry['fingerprint'], []
+                ).append(path)
+
+    if tag_index is not None:
+        update_tag_index(tag_index, directories, all_entries)
+
+    report = {
+        'duplicates': {
+            work: dirs for work, dirs in works.items() if len(dirs) > 1
+        },
+        'collisions': {
+            title: ps for title, ps in titles.items()
+            if len({p[1:3] for p in ps}) > 1
+        },
+        'non_adjacent': non_adjacent,
+        'identical_files': [
+            files for files in identical_files.values() if len(files) > 1
+        ],
+        'missing_title': missing_title,
+        'files_scanned': len(all_entries),
+        'files_read': n_read
+    }
+
+    return pieces, report
+
+
+def freeze_pieces(pieces):
+    """ returns a read-only version of pieces (as returned by
+        scan_pieces_from_sets) that can safely be shared between players,
+        already frozen pieces are returned as they are """
+
+    if isinstance(pieces, MappingProxyType):
+        return pieces
+    return MappingProxyType({
+        piece: tuple(files) for piece, files in pieces.items()
+    })
 
 
 def make_history_string_from_dict(history_dict):
@@ -62,6 +463,84 @@ def make_history_string_from_dict(history_dict):
     return history_str
 
 
+def make_report_string_from_dict(report_dict):
+    """ returns a human-readable version of the report created by
+        scan_pieces_from_sets """
+
+    report_str = ''
+    for (title, artist, album), directories in \
+            report_dict['duplicates'].items():
+        report_str += f'[duplicate] "{title}" by {artist} from album ' \
+            f'"{album}" found in:\n'
+        report_str += ''.join(f'    {d}\n' for d in directories)
+    for title, pieces in report_dict['collisions'].items():
+        report_str += f'[collision] "{title}" is used by:\n'
+        report_str += ''.join(
+            f'    {p[1]} / "{p[2]}" ({p[3]})\n' for p in pieces
+        )
+    for title, artist, album, directory in report_dict['non_adjacent']:
+        report_str += f'[non-adjacent] files of "{title}" are not next to ' \
+            f'each other in {directory}\n'
+    for files in report_dict['identical_files']:
+        report_str += '[identical] these files contain the same audio:\n'
+        report_str += ''.join(f'    {f}\n' for f in files)
+    for path in report_dict['missing_title']:
+        report_str += f'[missing title] {path} does not have a TIT2 ID3 tag\n'
+    if report_str == '':
+        report_str = 'No duplicates or collisions found.'
+    return report_str
+
+
+def get_duration_str_from_ms(ms):
+    """ returns a str like '12h 34m' for the given millisecond count (unlike
+        get_time_str_from_ms not limited to 24 hours) """
+
+    return f'{ms // 3600000}h {ms // 60000 % 60:02d}m'
+
+
+def make_statistics_string_from_dict(rollups_dict, n_top=10, n_days=7):
+    """ returns a human-readable version of the rollups of PlayStatistics:
+        totals, the n_top most played pieces of the current month, totals
+        per directory set and of each of the last n_days calendar days """
+
+    def counters_str(counters):
+        return f'{counters["started"]} started, {counters["completed"]} ' \
+            f'completed, {counters["skipped"]} skipped, listened ' \
+            f'{get_duration_str_from_ms(counters["listened_ms"])}'
+
+    def piece_str(piece_id):
+        title, artist = piece_id.split('\t')[:2]
+        return f'"{title}" by {artist}' if artist else f'"{title}"'
+
+    if rollups_dict['total']['started'] == 0:
+        return 'Nothing has been played yet.'
+
+    month = datetime.now().strftime('%Y-%m')
+    statistics_str = f'Total: {counters_str(rollups_dict["total"])}\n\n'
+    statistics_str += f'Most played pieces this month ({month}):\n'
+    top_pieces = sorted(
+        rollups_dict['months'].get(month, {}).items(),
+        key=lambda item: (item[1]['started'], item[1]['listened_ms']),
+        reverse=True
+    )[:n_top]
+    for piece_id, counters in top_pieces:
+        statistics_str += f'    {piece_str(piece_id)}: ' \
+            f'{counters_str(counters)}\n'
+    statistics_str += '\nPer directory set:\n'
+    for set_name, counters in sorted(rollups_dict['sets'].items()):
+        statistics_str += f'    {set_name or "(no set)"}: ' \
+            f'{counters_str(counters)}\n'
+    statistics_str += f'\nLast {n_days} days:\n'
+    today = datetime.now().date()
+    for days_ago in range(n_days - 1, -1, -1):
+        day = (today - timedelta(days=days_ago)).isoformat()
+        counters = rollups_dict['days'].get(day, {
+            'started': 0, 'completed': 0, 'skipped': 0, 'listened_ms': 0
+        })
+        statistics_str += f'    {day}: {counters_str(counters)}\n'
+    return statistics_str
+
+
 def get_icon_path(icn_name):
     """	returns the path to the icon with the given name using ICON_SIZE
         (icn_name without .png) """
@@ -83,25 +562,97 @@ def get_time_str_from_ms(ms):
         return time(minute=minutes, second=seconds).strftime("%M:%S")
 
 
+def get_movement_durations(files):
+    """ returns a list of the durations (in ms) of the given files, every file
+        is only read the first time its duration is needed (0 if the duration
+        can't be read) """
+
+    durations = []
+    for path in files:
+        if path not in _movement_durations:
+            try:
+                _movement_durations[path] = int(MP3(path).info.length * 1000)
+            except (MutagenError, OSError):
+                _movement_durations[path] = 0
+        durations.append(_movement_durations[path])
+    return durations
+
+
+def read_cover(path):
+    """ stores a thumbnail of the cover art of the mp3 file at path (or of
+        the folder cover of its directory, see find_folder_cover) and returns
+        its key (None if there is no cover art) """
+
+    key = read_embedded_cover(path)
+    if key is None:
+        directory = os.path.dirname(path)
+        try:
+            folder_cover = find_folder_cover(directory, os.listdir(directory))
+        except OSError:
+            folder_cover = None
+        if folder_cover:
+            key = store_folder_cover(folder_cover)
+    return key
+
+
+def get_piece_cover_path(files):
+    """ returns the path of the cover thumbnail of the piece consisting of
+        the given files (the cover of its first file), None if it has none,
+        files are only read if their cover is unknown or its thumbnail has
+        been evicted in the meantime (then COVERS_MAX_BYTES is enforced
+        again, as a thumbnail may have been added) """
+
+    if not files or not can_make_thumbnails():
+        return None
+    path = files[0]
+    key = _cover_keys.get(path)
+    cover_path = get_cover_path(key, COVERS_DIRECTORY) if key else None
+    if cover_path is None and (key is not None or path not in _cover_keys):
+        key = _cover_keys[path] = read_cover(path)
+        if key is not None:
+            evict_covers(COVERS_DIRECTORY, COVERS_MAX_BYTES)
+        cover_path = get_cover_path(key, COVERS_DIRECTORY) if key else None
+    return cover_path
+
+
+def make_piece_timeline(durations):
+    """ returns the prefix sums of the given movement durations, i.e. a list
+        whose i-th entry is the time (in ms) at which movement i starts and
+        whose last entry is the duration of the whole piece """
+
+    timeline = [0]
+    for duration in durations:
+        timeline.append(timeline[-1] + duration)
+    return timeline
+
+
+def locate_in_piece_timeline(timeline, ms):
+    """ returns (index of movement, offset in ms inside of that movement) for
+        the given time (in ms) relative to the start of the whole piece
+        (timeline as created by make_piece_timeline, at least one movement) """
+
+    ms = min(max(ms, 0), timeline[-1])
+    # timeline[index] <= ms < timeline[index + 1], but never past the last
+    # movement (ms might be the end of the piece)
+    index = min(bisect_right(timeline, ms) - 1, len(timeline) - 2)
+    return index, ms - timeline[index]
+
+
 def create_info_str(piece, files):
-    info_str = f'"{piece}"'
+    # artist and album have already been read while scanning (see
+    # scan_pieces_from_sets), piece is (title, artist, album, directory)
+    title, artist, album = piece[:3]
+    info_str = f'"{title}"'
 
-    try:  # if artist can be read from first file add it to info_str
-        info_str += f' by {EasyID3(files[0])["artist"][0]}'
-    except KeyError:  # else just pass
-        pass
+    if artist:  # if artist was read from first file add it to info_str
+        info_str += f' by {artist}'
 
-    try:  # if album can be read from first file add it to info_str
-        info_str += f' from album "{EasyID3(files[0])["album"][0]}" '
-    except KeyError:  # else just pass
-        pass
+    if album:  # if album was read from first file add it to info_str
+        info_str += f' from album "{album}" '
 
-    try:  # if length can be read from files sum it up and add it to info_str
-        play_time = 0
-        for entry in files:
-            play_time += int(EasyID3(entry)["length"][0])
+    # if length can be read from files sum it up and add it to info_str
+    play_time = sum(get_movement_durations(files))
+    if play_time > 0:
         info_str += f' ({get_time_str_from_ms(play_time)})'
-    except KeyError:  # else just pass
-        pass
 
     return info_str